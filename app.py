@@ -1,36 +1,231 @@
-from flask import Flask, request, jsonify
-from src_RAG.rag_classifier import RAGEnsembleClassifier
-from src_RAG.vector_store import VectorStore
+import json
+import os
+import threading
+import time
+from flask import Flask, request, jsonify, Response, g
+from src_RAG.serving import build_vector_store, watch_assets, build_classifier, classifier_gauges, parse_deadline
+from src_RAG.cache import ClassificationCache
+from src_RAG.jobs import JobManager, RUNNING, QUEUED
+from src_RAG.metrics import METRICS
 from pyngrok import ngrok
 
 app =Flask(__name__)
 
+# Prometheus metrics at /metrics; METRICS_ENABLED=0 turns every hook into a no-op
+METRICS.enabled = os.environ.get("METRICS_ENABLED", "1") != "0"
+
+@app.before_request
+def startTimer(): 
+    g.requestStart = time.perf_counter()
+
+@app.after_request
+def recordRequest(response): 
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    METRICS.inc("http_requests_total", endpoint=endpoint, method=request.method, status=response.status_code)
+    METRICS.observe("http_request_seconds", time.perf_counter() - g.requestStart, endpoint=endpoint)
+    return response
+
 @app.route("/", methods=["GET"])
 def home() : 
     return "Hi, my name is review classifier chan"
 
-# Initialize RAG classifier
-vs = VectorStore("assets/policies.md", "assets/exemplars.json")
-classifier = RAGEnsembleClassifier(vs)
+# Initialize RAG classifier (configured from the environment, see src_RAG/serving.py);
+# the embedding model is loaded by the warm-up or on the first request
+vs = build_vector_store()
+watch_assets(vs)
+cache = ClassificationCache("cache/classifications.sqlite", max_entries=10000, ttl=7 * 24 * 3600)
+classifier, pool = build_classifier(vs, cache)
+
+# Long-running batch jobs (e.g. whole CSVs), checkpointed to disk and resumed on restart
+jobs = JobManager(classifier, root="cache/jobs", max_jobs=int(os.environ.get("MAX_JOBS", 2)))
+
+def warmModels(): 
+    """Load the embedding model and every ensemble model in the background, retrying until all are resident (see /readyz)."""
+    vs.load_model()
+    delay = 2
+    while not classifier.warm_up():
+        time.sleep(delay)
+        delay = min(delay * 2, 60)
+    print(f"[Info] Ready: {', '.join(classifier.model)} loaded")
+
+# WARM_UP=0 skips it (e.g. when the app is imported by the benchmark)
+if os.environ.get("WARM_UP", "1") != "0":
+    threading.Thread(target=warmModels, name="warm-up", daemon=True).start()
+
+def collectGauges(): 
+    """Values owned by other components, sampled on every /metrics scrape."""
+    schedulerStats = classifier.scheduler.stats()
+    jobStates = [job["status"] for job in jobs.list_jobs()]
+    return classifier_gauges(classifier, cache, vs) + [
+        ("inference_queue_depth", "gauge", "LLM calls waiting in the scheduler per model and lane",
+         [({"model": m, "lane": "interactive"}, st["queued_interactive"]) for m, st in schedulerStats.items()]
+         + [({"model": m, "lane": "batch"}, st["queued_batch"]) for m, st in schedulerStats.items()]),
+        ("inference_in_flight", "gauge", "LLM calls currently running per model",
+         [({"model": m}, st["in_flight"]) for m, st in schedulerStats.items()]),
+        ("jobs", "gauge", "Batch jobs by state",
+         [({"state": state}, jobStates.count(state)) for state in (QUEUED, RUNNING)]),
+    ]
+
+METRICS.add_collector(collectGauges)
+
+@app.route("/healthz", methods=['GET'])
+def healthz(): 
+    """Liveness: the process is up and serving requests."""
+    return jsonify({"status": "alive"})
+
+@app.route("/readyz", methods=['GET'])
+def readyz(): 
+    """Readiness: 200 only once every ensemble model is loaded."""
+    ready = classifier.ready()
+    models = {m: m in classifier.loaded_models for m in classifier.model}
+    return jsonify({"ready": ready, "models": models}), 200 if ready else 503
 
 @app.route("/predict", methods=['POST'])
 def predict(): 
     data = request.json
     text = data.get("text", "")
     shop_info = data.get("shop_info", {})
+    # Per-stage timing breakdown on request: {"timings": true} or ?timings=1
+    timings = bool(data.get("timings")) or request.args.get("timings") == "1"
+    # Optional per-request deadline in seconds, shortening REQUEST_DEADLINE
+    try:
+        deadline = parse_deadline(data.get("deadline"), classifier.deadline)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     #Call our model 
-    result = classifier.classify(text, shop_info=shop_info)
+    result = classifier.classify(text, shop_info=shop_info, return_timings=timings, deadline=deadline)
     return jsonify(result)
 
 @app.route("/batch_predict", methods = ['POST'])
 def batchPredict(): 
     data = request.json
     reviewList = data.get("List", "")
-
-    result = classifier.classify_batch(reviewList)
+    try:
+        result = classifier.classify_batch(reviewList)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     return jsonify(result)
 
+@app.route("/batch_predict_stream", methods = ['POST'])
+def batchPredictStream(): 
+    """
+    Streaming /batch_predict: one record per review as soon as it completes.
+
+    Body is the same as /batch_predict plus optional "progress_every" (results
+    between progress records). Responds with NDJSON, or Server-Sent Events when
+    called with ?format=sse or "Accept: text/event-stream". Records:
+        {"type": "dedup", "total": N, "unique": U, "duplicates": D, ...}   (once, first)
+        {"type": "result", "index": i, "result": {...}, "elapsed": s}
+        {"type": "progress", "completed": n, "total": N, "elapsed": s, "reviews_per_sec": r}
+        {"type": "done", "total": N, "elapsed": s}
+    """
+    data = request.json
+    reviewList = data.get("List", [])
+    # Validated up front: once streaming has started the status is already 200
+    try:
+        classifier._prepare_tasks(reviewList, None)
+        progressEvery = max(1, int(data.get("progress_every", 10)))
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    useSSE = request.args.get("format") == "sse" or "text/event-stream" in request.headers.get("Accept", "")
+
+    def encode(record):
+        line = json.dumps(record, default=str)
+        return f"data: {line}\n\n" if useSSE else line + "\n"
+
+    def generate():
+        start = time.time()
+        total = len(reviewList)
+        completed = 0
+        dedupStats = {}
+        for index, result in classifier.classify_batch_iter(reviewList, stats=dedupStats):
+            if completed == 0:
+                yield encode({"type": "dedup", **dedupStats})
+            completed += 1
+            elapsed = time.time() - start
+            yield encode({"type": "result", "index": index, "result": result, "elapsed": round(elapsed, 3)})
+            if completed % progressEvery == 0 or completed == total:
+                yield encode({
+                    "type": "progress",
+                    "completed": completed,
+                    "total": total,
+                    "elapsed": round(elapsed, 3),
+                    "reviews_per_sec": round(completed / elapsed, 3) if elapsed > 0 else None
+                })
+        yield encode({"type": "done", "total": total, "elapsed": round(time.time() - start, 3)})
+
+    mimetype = "text/event-stream" if useSSE else "application/x-ndjson"
+    return Response(generate(), mimetype=mimetype, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/jobs", methods=['POST'])
+def submitJob(): 
+    """Submit a batch job from JSON {"List": [...]} or a multipart CSV upload ("file", "text_column")."""
+    try:
+        if "file" in request.files:
+            jobId = jobs.submit_csv(
+                request.files["file"].stream,
+                text_column=request.form.get("text_column", "text"),
+                business_column=request.form.get("business_column"),
+            )
+        else:
+            data = request.json or {}
+            jobId = jobs.submit(
+                data.get("List", []),
+                shop_info=data.get("shop_info"),
+                show_rationale=data.get("show_rationale", False),
+            )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(jobs.status(jobId)), 202
+
+@app.route("/jobs", methods=['GET'])
+def listJobs(): 
+    return jsonify(jobs.list_jobs())
+
+@app.route("/jobs/<jobId>", methods=['GET'])
+def jobStatus(jobId): 
+    status = jobs.status(jobId)
+    if status is None:
+        return jsonify({"error": "job not found"}), 404
+    return jsonify(status)
+
+@app.route("/jobs/<jobId>/results", methods=['GET'])
+def jobResults(jobId): 
+    offset = request.args.get("offset", 0, type=int)
+    limit = min(request.args.get("limit", 100, type=int), 1000)
+    page = jobs.results(jobId, offset=offset, limit=limit)
+    if page is None:
+        return jsonify({"error": "job not found"}), 404
+    return jsonify(page)
+
+@app.route("/exemplars", methods=['POST'])
+def addExemplars(): 
+    """Add labeled exemplars to the live index: {"List": [{"text": ..., "label": ...}, ...]}."""
+    data = request.json or {}
+    exemplars = data.get("List", [])
+    if not all(isinstance(e, dict) and isinstance(e.get("text"), str) for e in exemplars):
+        return jsonify({"error": "List must hold {\"text\", \"label\"} objects"}), 400
+    total = vs.add([e["text"] for e in exemplars], [e.get("label") for e in exemplars])
+    return jsonify({"added": len(exemplars), "passages": total})
+
+@app.route("/backends", methods=['GET'])
+def backends(): 
+    """Per-host load and health of the Ollama pool (empty without OLLAMA_BACKENDS)."""
+    return jsonify(pool.stats() if pool else [])
+
+@app.route("/metrics", methods=['GET'])
+def metrics(): 
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/cache_stats", methods=['GET'])
+def cacheStats(): 
+    return jsonify(cache.stats())
+
+@app.route("/prefilter_stats", methods=['GET'])
+def preFilterStats(): 
+    return jsonify(classifier.pre_filter_stats())
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=4000)
 
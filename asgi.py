@@ -0,0 +1,146 @@
+"""
+Async serving mode: the classifier's async path (ollama.AsyncClient) behind Starlette.
+
+    gunicorn -c gunicorn.conf.py asgi:app      # multi-worker; embedding model and index loaded once before forking
+    uvicorn asgi:app --host 0.0.0.0 --port 4000 # single process
+
+Serves /predict, /batch_predict, /metrics, /cache_stats and /prefilter_stats like
+app.py, plus /healthz (liveness) and /readyz (readiness: every ensemble model
+loaded). Batch jobs and streaming stay on the Flask app.
+"""
+import asyncio
+import contextlib
+import os
+import time
+
+# The tokenizer's thread pool must not be started before gunicorn forks
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+
+from src_RAG.serving import build_vector_store, watch_assets, build_classifier, classifier_gauges, parse_deadline
+from src_RAG.embeddings import FORK_SAFE_BACKENDS
+from src_RAG.cache import ClassificationCache
+from src_RAG.metrics import METRICS
+
+# Prometheus metrics at /metrics; METRICS_ENABLED=0 turns every hook into a no-op
+METRICS.enabled = os.environ.get("METRICS_ENABLED", "1") != "0"
+
+# Loaded at import time (configured from the environment, see src_RAG/serving.py). With
+# gunicorn's preload_app that is once, in the master, and the forked workers share the
+# embedding model and the mmapped index copy-on-write
+vs = build_vector_store()
+# ONNX Runtime sessions don't survive a fork: those backends load in each worker's lifespan instead
+if vs.embedding_backend in FORK_SAFE_BACKENDS:
+    vs.load_model()
+
+# Created per worker at startup: SQLite connections and the async client's
+# connection pool must not be carried across a fork
+cache = None
+classifier = None
+
+async def warmModels():
+    """Load every ensemble model, retrying with backoff until all are resident."""
+    delay = 2
+    while not await classifier.awarm_up():
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 60)
+    print(f"[Info] Worker {os.getpid()} ready: {', '.join(classifier.model)} loaded")
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    global cache, classifier
+    await asyncio.to_thread(vs.load_model)
+    cache = ClassificationCache("cache/classifications.sqlite", max_entries=10000, ttl=7 * 24 * 3600)
+    classifier, _ = build_classifier(vs, cache)
+    METRICS.add_collector(collectGauges)
+    # A watcher per worker: threads don't survive the fork
+    watch_assets(vs)
+    warmer = asyncio.create_task(warmModels())
+    yield
+    warmer.cancel()
+
+class RequestMetrics(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        start = time.perf_counter()
+        response = await call_next(request)
+        route = request.scope.get("route")
+        endpoint = route.path if route is not None else "unmatched"
+        METRICS.inc("http_requests_total", endpoint=endpoint, method=request.method, status=response.status_code)
+        METRICS.observe("http_request_seconds", time.perf_counter() - start, endpoint=endpoint)
+        return response
+
+def collectGauges():
+    return classifier_gauges(classifier, cache, vs) + [
+        ("models_loaded", "gauge", "Ensemble models loaded by the warm-up",
+         [({"model": m}, int(m in classifier.loaded_models)) for m in classifier.model]),
+    ]
+
+async def home(request):
+    return PlainTextResponse("Hi, my name is review classifier chan")
+
+async def healthz(request):
+    """Liveness: the worker is up and serving its event loop."""
+    return JSONResponse({"status": "alive"})
+
+async def readyz(request):
+    """Readiness: 200 only once every ensemble model is loaded."""
+    models = {m: m in classifier.loaded_models for m in classifier.model}
+    ready = classifier.ready()
+    return JSONResponse({"ready": ready, "models": models}, status_code=200 if ready else 503)
+
+async def predict(request):
+    data = await request.json()
+    text = data.get("text", "")
+    shop_info = data.get("shop_info", {})
+    # Per-stage timing breakdown on request: {"timings": true} or ?timings=1
+    timings = bool(data.get("timings")) or request.query_params.get("timings") == "1"
+    # Optional per-request deadline in seconds, shortening REQUEST_DEADLINE
+    try:
+        deadline = parse_deadline(data.get("deadline"), classifier.deadline)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    result = await classifier.aclassify(text, shop_info=shop_info, return_timings=timings, deadline=deadline)
+    return JSONResponse(result)
+
+async def batchPredict(request):
+    data = await request.json()
+    reviewList = data.get("List", [])
+    try:
+        result = await classifier.aclassify_batch(reviewList)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return JSONResponse(result)
+
+async def metrics(request):
+    return Response(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+async def cacheStats(request):
+    return JSONResponse(cache.stats())
+
+async def preFilterStats(request):
+    return JSONResponse(classifier.pre_filter_stats())
+
+app = Starlette(
+    routes=[
+        Route("/", home),
+        Route("/healthz", healthz),
+        Route("/readyz", readyz),
+        Route("/predict", predict, methods=["POST"]),
+        Route("/batch_predict", batchPredict, methods=["POST"]),
+        Route("/metrics", metrics),
+        Route("/cache_stats", cacheStats),
+        Route("/prefilter_stats", preFilterStats),
+    ],
+    middleware=[Middleware(RequestMetrics)],
+    lifespan=lifespan,
+)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=4000)
@@ -0,0 +1,17 @@
+# Production serving of the async app: gunicorn -c gunicorn.conf.py asgi:app
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:4000")
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Each worker is one event loop holding hundreds of reviews in flight. Every worker
+# allows OLLAMA_NUM_PARALLEL calls per model, so the backend sees workers x that
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+
+# Import asgi.py (embedding model + FAISS index) once in the master, then fork;
+# the cache, classifier and async client are created per worker at startup
+preload_app = True
+
+# Batch requests wait on every review's LLM calls
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 600))
+graceful_timeout = 30
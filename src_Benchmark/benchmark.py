@@ -0,0 +1,351 @@
+"""
+Offline throughput/latency benchmark for the RAG ensemble.
+
+Runs classify, classify_batch and (optionally) the Flask routes against
+MockOllama, so no real models are needed, and reports p50/p95/p99 latency,
+reviews/sec and LLM calls per review for each batch size / worker count.
+
+Usage:
+    python -m src_Benchmark.benchmark                      # run and compare to the baseline
+    python -m src_Benchmark.benchmark --save-baseline      # record a new baseline
+    python -m src_Benchmark.benchmark --batch-sizes 50 200 --workers 1 4 --flask
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from src_RAG.rag_classifier import RAGEnsembleClassifier
+from src_RAG.hedging import TailLatencyConfig
+from src_RAG.scheduler import InferenceScheduler
+from src_RAG.vector_store import VectorStore
+from src_RAG.backends import OllamaPool
+from src_Benchmark.mock_ollama import MockOllama, AsyncMockOllama, DEFAULT_LATENCY
+from src_Benchmark.mock_ollama_server import MockOllamaServer
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def summarize(name, latencies, wall_time, reviews, llm_calls, errors, **config):
+    latencies = np.asarray(latencies) if latencies else np.zeros(1)
+    return {
+        "name": name,
+        **config,
+        "reviews": reviews,
+        "p50": float(np.percentile(latencies, 50)),
+        "p95": float(np.percentile(latencies, 95)),
+        "p99": float(np.percentile(latencies, 99)),
+        "reviews_per_sec": reviews / wall_time if wall_time > 0 else 0.0,
+        "llm_calls_per_review": llm_calls / reviews if reviews else 0.0,
+        "errors": errors,
+    }
+
+
+def bench_classify(vs, backend, texts, workers):
+    """Sequential interactive calls: per-request latency."""
+    classifier = RAGEnsembleClassifier(vs, client=backend, scheduler=InferenceScheduler(concurrency=workers))
+    backend.reset()
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    for text in texts:
+        t0 = time.perf_counter()
+        try:
+            classifier.classify(text)
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - t0)
+    wall_time = time.perf_counter() - start
+    return summarize(f"classify[workers={workers}]", latencies, wall_time, len(texts), backend.total_calls(), errors, workers=workers)
+
+
+def bench_classify_batch(vs, backend, texts, workers):
+    """One batch: latency is each review's time from batch start to its result."""
+    classifier = RAGEnsembleClassifier(vs, client=backend, scheduler=InferenceScheduler(concurrency=workers))
+    backend.reset()
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    for _, result in classifier.classify_batch_iter(texts):
+        latencies.append(time.perf_counter() - start)
+        errors += result.get("label") == "error"
+    wall_time = time.perf_counter() - start
+    return summarize(
+        f"classify_batch[n={len(texts)},workers={workers}]",
+        latencies, wall_time, len(texts), backend.total_calls(), errors,
+        batch_size=len(texts), workers=workers,
+    )
+
+
+def bench_aclassify(vs, backend, texts, workers):
+    """All reviews in flight at once through aclassify on one event loop: latency under load."""
+    classifier = RAGEnsembleClassifier(vs, async_client=backend, scheduler=InferenceScheduler(concurrency=workers))
+    backend.reset()
+
+    async def timed(text, start):
+        try:
+            await classifier.aclassify(text)
+            return time.perf_counter() - start, False
+        except Exception:
+            return time.perf_counter() - start, True
+
+    async def run():
+        start = time.perf_counter()
+        return await asyncio.gather(*(timed(text, start) for text in texts))
+
+    start = time.perf_counter()
+    outcomes = asyncio.run(run())
+    wall_time = time.perf_counter() - start
+    latencies = [latency for latency, _ in outcomes]
+    errors = sum(failed for _, failed in outcomes)
+    return summarize(
+        f"aclassify[in_flight={len(texts)},workers={workers}]",
+        latencies, wall_time, len(texts), backend.total_calls(), errors,
+        batch_size=len(texts), workers=workers,
+    )
+
+
+def bench_tail(vs, texts, args):
+    """
+    Sequential classify against a backend whose calls sometimes stall: without
+    deadlines, with a deadline, and with a deadline plus hedging. Each classifier
+    first serves a few unmeasured requests so the hedge percentile has samples.
+    """
+    deadline = args.tail_deadline * args.time_scale
+    variants = [
+        ("none", {}),
+        ("deadline", {"deadline": deadline}),
+        ("deadline+hedge", {"deadline": deadline, "hedge_percentile": args.hedge_percentile}),
+    ]
+    warm, measured = texts[:20], texts[20:]
+    scenarios = []
+    for name, options in variants:
+        backend = MockOllama(
+            latency=DEFAULT_LATENCY,
+            concurrency=args.backend_concurrency,
+            time_scale=args.time_scale,
+            stall_rate=args.stall_rate,
+        )
+        classifier = RAGEnsembleClassifier(
+            vs, client=backend, scheduler=InferenceScheduler(concurrency=args.backend_concurrency),
+            tail_latency=TailLatencyConfig(hedge_min_samples=len(warm), **options),
+        )
+        for text in warm:
+            classifier.classify(text)
+        backend.reset()
+        latencies, errors, partial = [], 0, 0
+        start = time.perf_counter()
+        for text in measured:
+            t0 = time.perf_counter()
+            try:
+                result = classifier.classify(text, return_timings=True)
+                partial += result["resolved_by"] == "quorum"
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - t0)
+        wall_time = time.perf_counter() - start
+        scenarios.append(summarize(
+            f"tail[{name}]", latencies, wall_time, len(measured), backend.total_calls(), errors,
+            stall_rate=args.stall_rate, partial_quorum=partial,
+        ))
+    return scenarios
+
+
+def bench_pool(vs, texts, hosts, args, one_down=False):
+    """classify_batch through an OllamaPool over `hosts` stand-in servers (optionally one answering 503s)."""
+    servers = [
+        MockOllamaServer(backend=MockOllama(
+            latency=DEFAULT_LATENCY,
+            failure_rate=args.failure_rate,
+            concurrency=args.backend_concurrency,
+            time_scale=args.time_scale,
+        )).start()
+        for _ in range(hosts)
+    ]
+    try:
+        if one_down:
+            servers[0].down = True
+        pool = OllamaPool(
+            [{"url": s.url, "models": list(DEFAULT_LATENCY), "max_in_flight": args.backend_concurrency} for s in servers],
+            health_interval=0,
+        )
+        classifier = RAGEnsembleClassifier(vs, client=pool, scheduler=InferenceScheduler(model_concurrency=pool.capacity()))
+        latencies, errors = [], 0
+        start = time.perf_counter()
+        for _, result in classifier.classify_batch_iter(texts):
+            latencies.append(time.perf_counter() - start)
+            errors += result.get("label") == "error"
+        wall_time = time.perf_counter() - start
+        calls = sum(s["requests"] for s in pool.stats())
+    finally:
+        for server in servers:
+            server.stop()
+    return summarize(
+        f"pool[hosts={hosts}{',one_down' if one_down else ''},n={len(texts)}]",
+        latencies, wall_time, len(texts), calls, errors,
+        batch_size=len(texts), hosts=hosts,
+    )
+
+
+def bench_flask(backend, texts, single_requests, batch_size):
+    """/predict per review and one /batch_predict through the Flask test client."""
+    os.environ.setdefault("WARM_UP", "0")  # the app would otherwise warm the real models
+    import app as flask_app  # builds the app's own VectorStore and classifier
+
+    flask_app.classifier.client = backend
+    flask_app.classifier.cache = None  # every request must reach the backend
+    client = flask_app.app.test_client()
+    results = []
+
+    backend.reset()
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    for text in texts[:single_requests]:
+        t0 = time.perf_counter()
+        response = client.post("/predict", json={"text": text})
+        errors += response.status_code != 200
+        latencies.append(time.perf_counter() - t0)
+    wall_time = time.perf_counter() - start
+    results.append(summarize("flask /predict", latencies, wall_time, single_requests, backend.total_calls(), errors))
+
+    batch = (texts * (batch_size // len(texts) + 1))[:batch_size]
+    backend.reset()
+    start = time.perf_counter()
+    response = client.post("/batch_predict", json={"List": batch})
+    wall_time = time.perf_counter() - start
+    errors = sum(r.get("label") == "error" for r in response.json) if response.status_code == 200 else batch_size
+    results.append(summarize(
+        f"flask /batch_predict[n={batch_size}]", [wall_time], wall_time, batch_size, backend.total_calls(), errors,
+        batch_size=batch_size,
+    ))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Scenarios whose throughput fell or p95 rose by more than `tolerance` versus the baseline."""
+    previous = {r["name"]: r for r in baseline.get("scenarios", [])}
+    regressions = []
+    for r in results["scenarios"]:
+        old = previous.get(r["name"])
+        if old is None:
+            continue
+        if r["reviews_per_sec"] < old["reviews_per_sec"] * (1 - tolerance):
+            regressions.append(f"{r['name']}: reviews/sec {old['reviews_per_sec']:.2f} -> {r['reviews_per_sec']:.2f}")
+        if r["p95"] > old["p95"] * (1 + tolerance):
+            regressions.append(f"{r['name']}: p95 {old['p95']:.3f}s -> {r['p95']:.3f}s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the RAG ensemble against a mock Ollama backend")
+    parser.add_argument("--data", default="data/reviews_dataset.csv")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[20, 100])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4],
+                        help="Scheduler concurrency per model")
+    parser.add_argument("--single-requests", type=int, default=10)
+    parser.add_argument("--async-in-flight", type=int, default=200,
+                        help="Concurrent reviews in the async (aclassify) scenario; 0 skips it")
+    parser.add_argument("--backend-concurrency", type=int, default=2,
+                        help="Calls the mock backend serves at once per model")
+    parser.add_argument("--time-scale", type=float, default=0.02,
+                        help="Scales the mock latencies (1.0 = realistic 7B timings)")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--flask", action="store_true", help="Also benchmark the Flask routes")
+    parser.add_argument("--pool-hosts", type=int, nargs="*", default=[],
+                        help="Also run classify_batch through an OllamaPool of this many stand-in servers")
+    parser.add_argument("--tail-requests", type=int, default=0,
+                        help="Also compare deadlines and hedging on this many sequential requests to a stalling backend")
+    parser.add_argument("--stall-rate", type=float, default=0.03,
+                        help="Share of mock calls that stall in the tail scenario")
+    parser.add_argument("--tail-deadline", type=float, default=5.0,
+                        help="Request deadline of the tail scenario, before --time-scale")
+    parser.add_argument("--hedge-percentile", type=float, default=90)
+    parser.add_argument("--output", default="bench_results/latest.json")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Relative slowdown tolerated before flagging a regression")
+    args = parser.parse_args()
+
+    texts = pd.read_csv(args.data)["text"].tolist()
+    backend = MockOllama(
+        latency=DEFAULT_LATENCY,
+        failure_rate=args.failure_rate,
+        concurrency=args.backend_concurrency,
+        time_scale=args.time_scale,
+    )
+    vs = VectorStore("assets/policies.md", "assets/exemplars.json")
+
+    scenarios = []
+    for workers in args.workers:
+        scenarios.append(bench_classify(vs, backend, texts[:args.single_requests], workers))
+        for batch_size in args.batch_sizes:
+            batch = (texts * (batch_size // len(texts) + 1))[:batch_size]
+            scenarios.append(bench_classify_batch(vs, backend, batch, workers))
+        if args.async_in_flight:
+            batch = (texts * (args.async_in_flight // len(texts) + 1))[:args.async_in_flight]
+            # A fresh backend per run: its semaphores belong to that run's event loop
+            async_backend = AsyncMockOllama(
+                latency=DEFAULT_LATENCY,
+                failure_rate=args.failure_rate,
+                concurrency=args.backend_concurrency,
+                time_scale=args.time_scale,
+            )
+            scenarios.append(bench_aclassify(vs, async_backend, batch, workers))
+    for hosts in args.pool_hosts:
+        batch = (texts * (max(args.batch_sizes) // len(texts) + 1))[:max(args.batch_sizes)]
+        scenarios.append(bench_pool(vs, batch, hosts, args))
+        if hosts > 1:
+            scenarios.append(bench_pool(vs, batch, hosts, args, one_down=True))
+    if args.tail_requests:
+        requests = (texts * ((args.tail_requests + 20) // len(texts) + 1))[:args.tail_requests + 20]
+        scenarios.extend(bench_tail(vs, requests, args))
+    if args.flask:
+        scenarios.extend(bench_flask(backend, texts, args.single_requests, max(args.batch_sizes)))
+
+    results = {
+        "timestamp": time.time(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "save_baseline")},
+        "scenarios": scenarios,
+    }
+
+    print(f"\n{'Scenario':<40} {'p50 (s)':<10} {'p95 (s)':<10} {'p99 (s)':<10} {'reviews/s':<11} {'LLM/review':<11} {'errors':<6}")
+    print("-" * 100)
+    for r in scenarios:
+        print(f"{r['name']:<40} {r['p50']:<10.3f} {r['p95']:<10.3f} {r['p99']:<10.3f} "
+              f"{r['reviews_per_sec']:<11.2f} {r['llm_calls_per_review']:<11.2f} {r['errors']:<6}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline yet; run with --save-baseline to record one.")
+        return 0
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get("config", {}).get("time_scale") != args.time_scale:
+        print("[Warning] Baseline was recorded with a different --time-scale; comparison is not meaningful.")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nREGRESSIONS against baseline:")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Startup time, memory and encode throughput of the VectorStore embedding backends,
+against the current path (torch, float32 storage).
+
+Every configuration runs in fresh interpreters, so import costs and peak RSS are its own:
+  - import: `import src_RAG.vector_store` (heavy libraries are deferred to first use)
+  - cold start: VectorStore() without a persisted index, embedding every passage
+  - warm start: VectorStore() over the persisted index, which needs no embedding model
+  - model load, encode throughput (batches of 64), single-review latency and peak RSS
+  - index size on disk, and agreement: mean cosine similarity of each backend's
+    embeddings with the current path's
+
+Usage:
+    python -m src_Benchmark.embedding_benchmark
+    python -m src_Benchmark.embedding_benchmark --backends int8 onnx-int8 --texts 2000 \\
+        --extra-exemplars data/reviews_dataset.csv
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import json
+import shutil
+import subprocess
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = ("torch", "float32")
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_worker(args):
+    """One configuration in this process; prints its measurements as JSON on the last line."""
+    start = time.perf_counter()
+    from src_RAG.vector_store import VectorStore
+    import_s = time.perf_counter() - start
+    imported = sorted(m for m in ("torch", "sentence_transformers", "faiss", "onnxruntime") if m in sys.modules)
+
+    start = time.perf_counter()
+    vs = VectorStore(
+        args.policies, args.exemplars, embedding_model=args.embedding_model, index_dir=args.index_dir,
+        extra_exemplars=args.extra_exemplars, embedding_backend=args.worker, storage=args.storage,
+    )
+    start_s = time.perf_counter() - start
+    start_rss = peak_rss_mb()
+
+    start = time.perf_counter()
+    model = vs.load_model()
+    model_load_s = time.perf_counter() - start
+
+    import numpy as np
+    import pandas as pd
+    texts = pd.read_csv(args.data)["text"].dropna().astype(str).tolist()
+    texts = (texts * (args.texts // max(1, len(texts)) + 1))[:args.texts]
+
+    start = time.perf_counter()
+    embeddings = model.encode(texts, convert_to_numpy=True, normalize_embeddings=True, batch_size=64, show_progress_bar=False)
+    encode_s = time.perf_counter() - start
+    latencies = []
+    for text in texts[:100]:
+        t0 = time.perf_counter()
+        model.encode([text], convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False)
+        latencies.append(time.perf_counter() - t0)
+    np.save(args.embeddings_out, np.asarray(embeddings, dtype=np.float32))
+
+    print(json.dumps({
+        "import_s": import_s,
+        "imported_at_import": imported,
+        "start_s": start_s,
+        "start_rss_mb": start_rss,
+        "model_load_s": model_load_s,
+        "texts_per_sec": len(texts) / encode_s if encode_s > 0 else 0.0,
+        "single_p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "rss_mb": peak_rss_mb(),
+    }))
+
+
+def measure(backend, storage, index_dir, embeddings_out, args):
+    command = [
+        sys.executable, "-m", "src_Benchmark.embedding_benchmark", "--worker", backend, "--storage", storage,
+        "--index-dir", index_dir, "--embeddings-out", embeddings_out, "--texts", str(args.texts),
+        "--data", args.data, "--policies", args.policies, "--exemplars", args.exemplars,
+        "--embedding-model", args.embedding_model, "--extra-exemplars", *args.extra_exemplars,
+    ]
+    completed = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "worker failed")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup, memory and encode throughput of the embedding backends")
+    parser.add_argument("--backends", nargs="+", default=["torch", "int8", "onnx", "onnx-int8"])
+    parser.add_argument("--storage", default="float16", help="Storage of the compared configurations")
+    parser.add_argument("--texts", type=int, default=1000, help="Reviews encoded for the throughput measurement")
+    parser.add_argument("--data", default="data/reviews_dataset.csv")
+    parser.add_argument("--policies", default="assets/policies.md")
+    parser.add_argument("--exemplars", default="assets/exemplars.json")
+    parser.add_argument("--extra-exemplars", nargs="*", default=[])
+    parser.add_argument("--embedding-model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--output", default="bench_results/embeddings.json")
+    # Internal: run one configuration (used by the parent process)
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--index-dir", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--embeddings-out", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_worker(args)
+
+    import numpy as np
+
+    configs = [BASELINE] + [(b, args.storage) for b in args.backends if (b, args.storage) != BASELINE]
+    workdir = tempfile.mkdtemp(prefix="embedding-bench-")
+    results, reference = [], None
+    try:
+        for backend, storage in configs:
+            index_dir = os.path.join(workdir, f"{backend}-{storage}")
+            embeddings_out = os.path.join(workdir, f"{backend}-{storage}.npy")
+            try:
+                cold = measure(backend, storage, index_dir, embeddings_out, args)
+                warm = measure(backend, storage, index_dir, embeddings_out, args)
+            except Exception as e:
+                print(f"[Warning] Skipping {backend}/{storage}: {e}")
+                continue
+
+            embeddings = np.load(embeddings_out)
+            if reference is None and (backend, storage) == BASELINE:
+                reference = embeddings
+            agreement = float(np.mean(np.sum(embeddings * reference, axis=1))) if reference is not None else None
+            index_mb = sum(os.path.getsize(os.path.join(index_dir, f)) for f in os.listdir(index_dir)) / (1024 * 1024)
+            results.append({
+                "backend": backend,
+                "storage": storage,
+                "import_s": warm["import_s"],
+                "imported_at_import": warm["imported_at_import"],
+                "cold_start_s": cold["start_s"],
+                "warm_start_s": warm["start_s"],
+                "warm_start_rss_mb": warm["start_rss_mb"],
+                "model_load_s": warm["model_load_s"],
+                "texts_per_sec": warm["texts_per_sec"],
+                "single_p50_ms": warm["single_p50_ms"],
+                "rss_mb": warm["rss_mb"],
+                "index_mb": index_mb,
+                "agreement": agreement,
+            })
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else "-"
+
+    print(f"\n{'Backend':<18} {'Import (s)':<11} {'Cold (s)':<9} {'Warm (s)':<9} {'Model (s)':<10} "
+          f"{'RSS (MB)':<9} {'texts/s':<9} {'p50 (ms)':<9} {'Index (MB)':<11} {'Agreement':<9}")
+    print("-" * 112)
+    for r in results:
+        print(f"{r['backend'] + '/' + r['storage']:<18} {r['import_s']:<11.2f} {r['cold_start_s']:<9.2f} "
+              f"{r['warm_start_s']:<9.2f} {r['model_load_s']:<10.2f} {fmt(r['rss_mb'], '<9.0f')} "
+              f"{r['texts_per_sec']:<9.0f} {r['single_p50_ms']:<9.2f} {r['index_mb']:<11.2f} {fmt(r['agreement'], '<9.4f')}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({"timestamp": time.time(), "config": vars(args), "results": results}, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Recall vs query latency of the approximate vector indexes (IVF, HNSW) against exact flat search.
+
+By default the corpus is synthetic: clustered unit vectors shaped like sentence
+embeddings, so large corpora are quick to generate. --corpus embeds a real CSV
+(e.g. data/reviews.csv) with the VectorStore's embedding model instead.
+
+Usage:
+    python -m src_Benchmark.index_benchmark
+    python -m src_Benchmark.index_benchmark --sizes 10000 50000 --nprobe 4 16 64 --ef-search 32 128
+    python -m src_Benchmark.index_benchmark --corpus data/reviews.csv --embedding-backend int8
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import json
+import time
+
+import numpy as np
+
+from src_RAG.embeddings import EMBEDDING_BACKENDS, load_embedding_model
+from src_RAG.vector_store import STORAGE_TYPES, build_index, set_search_params
+
+
+def synthetic_corpus(n, dim, clusters, seed):
+    """Unit vectors drawn around `clusters` random centres, like topic-clustered reviews."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def embed_corpus(path, model_name, backend="torch"):
+    import pandas as pd
+
+    texts = pd.read_csv(path)["text"].dropna().astype(str).tolist()
+    model, _ = load_embedding_model(model_name, backend)
+    return model.encode(texts, convert_to_numpy=True, normalize_embeddings=True, batch_size=64, show_progress_bar=True).astype(np.float32)
+
+
+def measure(index, queries, truth, k):
+    """Recall@k against `truth`, batch throughput and single-query latency percentiles."""
+    start = time.perf_counter()
+    _, found = index.search(queries, k)
+    batch_time = time.perf_counter() - start
+
+    latencies = []
+    for query in queries[:200]:
+        t0 = time.perf_counter()
+        index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - t0)
+
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    return {
+        "recall": float(recall),
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "queries_per_sec": len(queries) / batch_time if batch_time > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs latency of IVF/HNSW against the flat index")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000], help="Synthetic corpus sizes")
+    parser.add_argument("--corpus", default=None, help="CSV with a 'text' column to embed instead of synthetic vectors")
+    parser.add_argument("--embedding-model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--embedding-backend", default="torch", choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--storage", nargs="+", default=["float32", "float16"], choices=STORAGE_TYPES,
+                        help="Vector storage of the indexes compared")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results/index.json")
+    args = parser.parse_args()
+
+    if args.corpus:
+        embedded = embed_corpus(args.corpus, args.embedding_model, args.embedding_backend)
+        corpora = [(f"{os.path.basename(args.corpus)}[n={len(embedded)}]", embedded)]
+    else:
+        corpora = [
+            (f"synthetic[n={n}]", synthetic_corpus(n + args.queries, args.dim, args.clusters, args.seed))
+            for n in args.sizes
+        ]
+
+    results = []
+    print(f"\n{'Corpus':<28} {'Index':<26} {'Build (s)':<10} {f'Recall@{args.k}':<10} {'p50 (ms)':<10} {'p95 (ms)':<10} {'queries/s':<10}")
+    print("-" * 106)
+    for name, vectors in corpora:
+        # Held-out queries: the last rows are searched for, never indexed
+        queries, corpus = vectors[-args.queries:], vectors[:-args.queries]
+
+        # Ground truth: exact float32 search
+        _, truth = build_index(corpus, "flat").search(queries, args.k)
+
+        configs = []
+        for storage in args.storage:
+            configs.append(("flat", storage, {}, [None]))
+            configs.append(("ivf", storage, {}, [{"nprobe": p} for p in args.nprobe]))
+            configs.append(("hnsw", storage, {"hnsw_m": args.hnsw_m}, [{"ef_search": ef} for ef in args.ef_search]))
+
+        for index_type, storage, build_params, search_params in configs:
+            start = time.perf_counter()
+            index = build_index(corpus, index_type, storage=storage, **build_params)
+            build_time = time.perf_counter() - start
+            name_type = index_type if storage == "float32" else f"{index_type}/fp16"
+
+            for params in search_params:
+                label = name_type if params is None else f"{name_type} " + ",".join(f"{k}={v}" for k, v in params.items())
+                if params:
+                    set_search_params(index, **params)
+                row = {"corpus": name, "index": label, "storage": storage, "build_s": build_time, **measure(index, queries, truth, args.k)}
+                results.append(row)
+                print(f"{name:<28} {label:<26} {build_time:<10.2f} {row['recall']:<10.3f} "
+                      f"{row['p50_ms']:<10.3f} {row['p95_ms']:<10.3f} {row['queries_per_sec']:<10.0f}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({"timestamp": time.time(), "config": vars(args), "results": results}, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+
+from src_RAG.rag_classifier import labels
+
+# Rough per-call latencies (seconds) of the real ensemble on a single local GPU
+DEFAULT_LATENCY = {
+    "llama2:7b": {"dist": "lognormal", "median": 1.2, "sigma": 0.35},
+    "deepseek-r1:7b": {"dist": "lognormal", "median": 2.5, "sigma": 0.5},
+    "gemma3:4b": {"dist": "lognormal", "median": 0.8, "sigma": 0.3},
+}
+
+
+class MockOllamaError(RuntimeError):
+    """Injected backend failure."""
+
+
+class MockOllama:
+    """
+    Local stand-in for `ollama.chat`, pluggable as RAGEnsembleClassifier(client=...).
+
+    Simulates a server per model: at most `concurrency[model]` calls run at
+    once (the rest queue, like a single Ollama instance), each taking a
+    sampled latency and failing with probability `failure_rate`. Answers are
+    deterministic per review, with models agreeing `agreement` of the time.
+
+    Args:
+        latency (dict): {model: {"dist": "fixed"|"uniform"|"lognormal"|"exponential", ...}}.
+            fixed: "value"; uniform: "low", "high"; lognormal: "median", "sigma";
+            exponential: "mean".
+        failure_rate (float or dict): Probability a call raises MockOllamaError.
+        concurrency (int or dict): Concurrent calls served per model.
+        agreement (float): Probability a model answers with the review's "true" label.
+        time_scale (float): Multiplies every latency (e.g. 0.01 for quick runs).
+        stall_rate (float): Probability a call stalls for `stall_time` seconds instead,
+            like a request stuck behind a long generation or a wedged runner.
+    """
+
+    def __init__(self, latency=None, failure_rate=0.0, concurrency=1, agreement=0.85, time_scale=1.0, seed=0, stall_rate=0.0, stall_time=30.0):
+        self.latency = latency or DEFAULT_LATENCY
+        self.failure_rate = failure_rate
+        self.concurrency = concurrency
+        self.agreement = agreement
+        self.time_scale = time_scale
+        self.stall_rate = stall_rate
+        self.stall_time = stall_time
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._slots = {}
+        self._lock = threading.Lock()
+        self.calls = {}
+        self.failures = {}
+
+    def _limit(self, model):
+        return self.concurrency.get(model, 1) if isinstance(self.concurrency, dict) else self.concurrency
+
+    def _slot(self, model):
+        with self._lock:
+            if model not in self._slots:
+                self._slots[model] = threading.Semaphore(self._limit(model))
+            return self._slots[model]
+
+    def _sample_latency(self, model):
+        spec = self.latency.get(model, {"dist": "fixed", "value": 1.0})
+        with self._rng_lock:
+            dist = spec["dist"]
+            if dist == "fixed":
+                value = spec["value"]
+            elif dist == "uniform":
+                value = self._rng.uniform(spec["low"], spec["high"])
+            elif dist == "lognormal":
+                value = self._rng.lognormvariate(0, spec["sigma"]) * spec["median"]
+            elif dist == "exponential":
+                value = self._rng.expovariate(1 / spec["mean"])
+            else:
+                raise ValueError(f"Unknown latency distribution '{dist}'")
+            if self.stall_rate and self._rng.random() < self.stall_rate:
+                value = self.stall_time
+            fails = self._rng.random() < (
+                self.failure_rate.get(model, 0.0) if isinstance(self.failure_rate, dict) else self.failure_rate
+            )
+        return value * self.time_scale, fails
+
+    def _answer(self, model, messages):
+        review = messages[-1]["content"].rsplit("[Review]", 1)[-1]
+        digest = hashlib.md5(review.encode("utf-8")).digest()
+        true_label = labels[digest[0] % len(labels)]
+        model_roll = hashlib.md5((model + review).encode("utf-8")).digest()
+        if model_roll[0] / 255 < self.agreement:
+            label = true_label
+        else:
+            label = labels[model_roll[1] % len(labels)]
+        return json.dumps({"label": label, "rationale": f"mock answer from {model}"})
+
+    def chat(self, model="", messages=None, **kwargs):
+        if not messages:
+            # Ollama's load request: no answer, no simulated inference
+            return {"message": {"role": "assistant", "content": ""}}
+        delay, fails = self._sample_latency(model)
+        with self._slot(model):
+            with self._lock:
+                self.calls[model] = self.calls.get(model, 0) + 1
+            time.sleep(delay)
+            if fails:
+                with self._lock:
+                    self.failures[model] = self.failures.get(model, 0) + 1
+                raise MockOllamaError(f"injected failure from {model}")
+            return {"message": {"role": "assistant", "content": self._answer(model, messages or [])}}
+
+    def total_calls(self):
+        with self._lock:
+            return sum(self.calls.values())
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.failures.clear()
+
+
+class AsyncMockOllama(MockOllama):
+    """
+    MockOllama with ollama.AsyncClient's `chat`, pluggable as RAGEnsembleClassifier(async_client=...).
+
+    Same latency, failure and answer model; waiting calls are coroutines on one event loop.
+    """
+
+    async def chat(self, model="", messages=None, **kwargs):
+        if not messages:
+            return {"message": {"role": "assistant", "content": ""}}
+        delay, fails = self._sample_latency(model)
+        # Created on first use inside the running loop (asyncio primitives are loop-bound)
+        if model not in self._slots:
+            self._slots[model] = asyncio.Semaphore(self._limit(model))
+        async with self._slots[model]:
+            with self._lock:
+                self.calls[model] = self.calls.get(model, 0) + 1
+            await asyncio.sleep(delay)
+            if fails:
+                with self._lock:
+                    self.failures[model] = self.failures.get(model, 0) + 1
+                raise MockOllamaError(f"injected failure from {model}")
+            return {"message": {"role": "assistant", "content": self._answer(model, messages)}}
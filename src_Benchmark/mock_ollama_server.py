@@ -0,0 +1,109 @@
+"""
+Local stand-in for an Ollama server: /api/chat and /api/tags over HTTP, answered by MockOllama.
+
+Several on different ports make a multi-host pool to test OllamaPool against:
+
+    python -m src_Benchmark.mock_ollama_server --port 11435 --models llama2:7b gemma3:4b
+    python -m src_Benchmark.mock_ollama_server --port 11436 --models deepseek-r1:7b gemma3:4b --failure-rate 0.2
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src_Benchmark.mock_ollama import MockOllama, MockOllamaError, DEFAULT_LATENCY
+
+
+class MockOllamaServer:
+    """
+    One stand-in Ollama host on `port` (0 picks a free one) serving `models`.
+
+    `backend` is the MockOllama that answers (latency, failures, concurrency).
+    `down` makes every request fail with a 503, like a host that is overloaded or
+    restarting, without closing the port; stop() closes it.
+    """
+
+    def __init__(self, port=0, models=None, backend=None, host="127.0.0.1"):
+        self.models = list(models or DEFAULT_LATENCY)
+        self.backend = backend or MockOllama()
+        self.down = False
+        self.requests = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name=f"mock-ollama-{self.url}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                if server.down:
+                    return self._reply(503, {"error": "server unavailable"})
+                if self.path == "/api/tags":
+                    return self._reply(200, {"models": [{"name": m, "model": m} for m in server.models]})
+                self._reply(404, {"error": "not found"})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                server.requests += 1
+                if server.down:
+                    return self._reply(503, {"error": "server unavailable"})
+                if self.path != "/api/chat":
+                    return self._reply(404, {"error": "not found"})
+                model = body.get("model", "")
+                if model not in server.models:
+                    return self._reply(404, {"error": f"model '{model}' not found"})
+                try:
+                    response = server.backend.chat(model=model, messages=body.get("messages"))
+                except MockOllamaError as e:
+                    return self._reply(500, {"error": str(e)})
+                self._reply(200, {"model": model, "message": response["message"], "done": True})
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a stand-in Ollama server")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--models", nargs="+", default=list(DEFAULT_LATENCY))
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--time-scale", type=float, default=1.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    backend = MockOllama(concurrency=args.concurrency, time_scale=args.time_scale, failure_rate=args.failure_rate)
+    server = MockOllamaServer(args.port, args.models, backend, host="0.0.0.0")
+    print(f"Stand-in Ollama serving {', '.join(args.models)} on port {args.port}")
+    server._server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+import asyncio
+import json
+import threading
+import time
+
+import ollama
+
+from src_RAG.metrics import METRICS
+
+
+class BackendUnavailable(RuntimeError):
+    """No healthy Ollama host is left to serve a model."""
+
+
+class _Host:
+    """One Ollama server: the models it serves, its load and its health."""
+
+    def __init__(self, url, models=None, max_in_flight=1, timeout=None):
+        self.url = url
+        self.models = set(models) if models else None  # None: whatever the server has
+        self.max_in_flight = max(1, max_in_flight)
+        self.timeout = timeout
+        self.available = None   # model names reported by the last active check
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.failures = 0       # consecutive failed calls (passive check)
+        self.down_until = 0.0   # passive check: skipped until then
+        self.reachable = True   # active check: answered the last /api/tags probe
+        self.latency = None     # moving average of call latency (seconds)
+        self._client = None
+        self._async = (None, None)  # (event loop, AsyncClient): httpx async pools are loop-bound
+
+    def serves(self, model):
+        if self.models is not None and model not in self.models:
+            return False
+        return self.available is None or model in self.available
+
+    def healthy(self, now):
+        return self.reachable and now >= self.down_until
+
+    def client(self):
+        if self._client is None:
+            self._client = ollama.Client(host=self.url, timeout=self.timeout)
+        return self._client
+
+    def async_client(self):
+        loop = asyncio.get_running_loop()
+        if self._async[0] is not loop:
+            self._async = (loop, ollama.AsyncClient(host=self.url, timeout=self.timeout))
+        return self._async[1]
+
+
+class _AsyncPoolClient:
+    """ollama.AsyncClient-shaped view of an OllamaPool, for RAGEnsembleClassifier(async_client=...)."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def chat(self, model="", messages=None, **kwargs):
+        return await self.pool.achat(model=model, messages=messages, **kwargs)
+
+
+class OllamaPool:
+    """
+    Routes chat calls across several Ollama hosts; pluggable as RAGEnsembleClassifier(client=...)
+    and, through `async_client`, as its async_client.
+
+    Every call goes to the least-loaded healthy host serving the model (fewest calls
+    in flight relative to its `max_in_flight`, then lowest latency). A failed call
+    is retried on another host. Health is tracked two ways:
+      - passive: `max_failures` consecutive failures take a host out for `cooldown`
+        seconds, after which one call probes it again;
+      - active: a background thread probes /api/tags every `health_interval`
+        seconds, marking hosts reachable or not and learning which models they have.
+
+    Args:
+        hosts (list[dict]): {"url": ..., "models": [...] (optional, default: any),
+            "max_in_flight": int (optional, default 1)} per host.
+        max_failures (int): Consecutive failures before a host is taken out.
+        cooldown (float): Seconds a failing host is skipped.
+        health_interval (float): Seconds between active checks (0 disables them).
+        timeout (float, optional): Per-call timeout in seconds.
+    """
+
+    def __init__(self, hosts, max_failures=3, cooldown=30.0, health_interval=10.0, timeout=None, metrics=None):
+        if not hosts:
+            raise ValueError("OllamaPool needs at least one host")
+        self.hosts = [
+            _Host(h["url"], h.get("models"), h.get("max_in_flight", 1), h.get("timeout", timeout))
+            for h in hosts
+        ]
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.health_interval = health_interval
+        self.metrics = metrics or METRICS
+        self.async_client = _AsyncPoolClient(self)
+        self._lock = threading.Lock()
+        self._checker = None
+
+    @classmethod
+    def from_file(cls, path):
+        """Pool from a JSON config: {"hosts": [...], plus any constructor argument}."""
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        return cls(**config)
+
+    def capacity(self, models=None):
+        """
+        {model: concurrent calls the configured hosts accept}, for InferenceScheduler(model_concurrency=...).
+
+        Hosts configured without "models" serve any model, so they count towards each
+        of `models` (the ensemble's), which is then required.
+        """
+        capacity = {}
+        for host in self.hosts:
+            if host.models is None and models is None:
+                raise ValueError(f"Ollama host {host.url} has no 'models' list; pass the ensemble's models to capacity()")
+            for model in host.models if host.models is not None else models:
+                capacity[model] = capacity.get(model, 0) + host.max_in_flight
+        return capacity
+
+    # --- Dispatch ------------------------------------------------------------
+
+    def _acquire(self, model, tried, last_error):
+        with self._lock:
+            now = time.monotonic()
+            candidates = [h for h in self.hosts if h.serves(model) and h.url not in tried and h.healthy(now)]
+            if not candidates:
+                raise BackendUnavailable(f"No healthy Ollama host left for {model}") from last_error
+            host = min(candidates, key=lambda h: (h.in_flight / h.max_in_flight, h.latency or 0.0))
+            host.in_flight += 1
+            host.requests += 1
+            return host
+
+    def _release(self, host, model, start, error, cancelled=False):
+        """
+        Record a finished call; returns whether a failed call may be retried on another host.
+        A cancelled call (a losing hedge, a timed-out request) only gives back its slot.
+        """
+        elapsed = time.monotonic() - start
+        retry = True
+        with self._lock:
+            host.in_flight -= 1
+            if cancelled:
+                pass
+            elif error is None:
+                host.failures = 0
+                host.latency = elapsed if host.latency is None else 0.8 * host.latency + 0.2 * elapsed
+            elif isinstance(error, ollama.ResponseError) and error.status_code == 404:
+                pass  # this host lacks the model; not a health problem
+            elif isinstance(error, ollama.ResponseError) and error.status_code < 500:
+                retry = False  # a bad request fails the same way everywhere
+            else:
+                host.errors += 1
+                host.failures += 1
+                now = time.monotonic()
+                if host.failures >= self.max_failures and now >= host.down_until:
+                    host.down_until = now + self.cooldown
+                    print(f"[Warning] Ollama host {host.url} failed {host.failures} times in a row; "
+                          f"skipping it for {self.cooldown:.0f}s")
+        outcome = "cancelled" if cancelled else "ok" if error is None else "error"
+        self.metrics.inc("backend_requests_total", host=host.url, model=model, outcome=outcome)
+        return retry
+
+    def chat(self, model="", messages=None, **kwargs):
+        if not messages:
+            return self._load(model, kwargs.get("keep_alive"))
+        self._start_health_checks()
+        tried, last_error = set(), None
+        while True:
+            host = self._acquire(model, tried, last_error)
+            start = time.monotonic()
+            # The slot is given back however the call ends, cancellation included
+            cancelled, error = True, None
+            try:
+                response = host.client().chat(model=model, messages=messages, **kwargs)
+                cancelled = False
+            except Exception as e:
+                cancelled, error = False, e
+            finally:
+                retry = self._release(host, model, start, error, cancelled)
+            if error is None:
+                return response
+            if not retry:
+                raise error
+            tried.add(host.url)
+            last_error = error
+            self.metrics.inc("backend_retries_total", model=model)
+
+    async def achat(self, model="", messages=None, **kwargs):
+        """chat() on each host's ollama.AsyncClient."""
+        if not messages:
+            return await asyncio.to_thread(self._load, model, kwargs.get("keep_alive"))
+        self._start_health_checks()
+        tried, last_error = set(), None
+        while True:
+            host = self._acquire(model, tried, last_error)
+            start = time.monotonic()
+            # The slot is given back however the call ends, cancellation included
+            cancelled, error = True, None
+            try:
+                response = await host.async_client().chat(model=model, messages=messages, **kwargs)
+                cancelled = False
+            except Exception as e:
+                cancelled, error = False, e
+            finally:
+                retry = self._release(host, model, start, error, cancelled)
+            if error is None:
+                return response
+            if not retry:
+                raise error
+            tried.add(host.url)
+            last_error = error
+            self.metrics.inc("backend_retries_total", model=model)
+
+    def _load(self, model, keep_alive):
+        """
+        Ollama's load request (an empty chat) goes to every healthy host serving the
+        model, so a warm-up leaves none of them cold. The model counts as loaded once
+        one of them has it; a host that fails the load counts it against its health.
+        """
+        self._start_health_checks()
+        now = time.monotonic()
+        hosts = [h for h in self.hosts if h.serves(model) and h.healthy(now)]
+        if not hosts:
+            raise BackendUnavailable(f"No healthy Ollama host serves {model}")
+        loaded, errors = 0, []
+        for host in hosts:
+            with self._lock:
+                host.in_flight += 1
+                host.requests += 1
+            start = time.monotonic()
+            try:
+                host.client().chat(model=model, messages=[], keep_alive=keep_alive)
+            except Exception as e:
+                self._release(host, model, start, e)
+                errors.append(f"{host.url}: {e}")
+                continue
+            self._release(host, model, start, None)
+            loaded += 1
+        if not loaded:
+            raise BackendUnavailable(f"Could not load {model} on " + "; ".join(errors))
+        if errors:
+            print(f"[Warning] Could not load {model} on " + "; ".join(errors))
+        return {"message": {"role": "assistant", "content": ""}}
+
+    # --- Active health checks ------------------------------------------------
+
+    def _start_health_checks(self):
+        if self._checker is None and self.health_interval:
+            with self._lock:
+                if self._checker is None:
+                    # Started on first use (the warm-up, or a call), so a pool built before a fork checks from the worker
+                    self._checker = threading.Thread(target=self._check_loop, name="ollama-health", daemon=True)
+                    self._checker.start()
+
+    def _check_loop(self):
+        while True:
+            self.check_health()
+            time.sleep(self.health_interval)
+
+    def check_health(self):
+        """Probe every host's /api/tags once; returns {url: reachable}."""
+        for host in self.hosts:
+            try:
+                listed = ollama.Client(host=host.url, timeout=5).list()
+                available = {m.model for m in listed.models}
+                reachable = True
+            except Exception:
+                available, reachable = None, False
+            with self._lock:
+                if reachable and not host.reachable:
+                    print(f"[Info] Ollama host {host.url} is reachable again")
+                elif not reachable and host.reachable:
+                    print(f"[Warning] Ollama host {host.url} failed its health check")
+                host.reachable = reachable
+                if reachable:
+                    host.available = available
+        return {host.url: host.reachable for host in self.hosts}
+
+    # --- Introspection -------------------------------------------------------
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "url": h.url,
+                    "healthy": h.healthy(now),
+                    "in_flight": h.in_flight,
+                    "max_in_flight": h.max_in_flight,
+                    "requests": h.requests,
+                    "errors": h.errors,
+                    "latency_ms": round(h.latency * 1000, 1) if h.latency is not None else None,
+                    "models": sorted(h.models) if h.models is not None else sorted(h.available or ()),
+                }
+                for h in self.hosts
+            ]
+
+    def collect(self):
+        """Metrics collector: per-host in-flight calls and health."""
+        stats = self.stats()
+        return [
+            ("backend_in_flight", "gauge", "LLM calls in flight per Ollama host",
+             [({"host": s["url"]}, s["in_flight"]) for s in stats]),
+            ("backend_healthy", "gauge", "Whether an Ollama host is taking calls (1) or skipped (0)",
+             [({"host": s["url"]}, int(s["healthy"])) for s in stats]),
+        ]
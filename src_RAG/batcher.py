@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from src_RAG.metrics import METRICS
+
+
+class SearchBatcher:
+    """
+    Coalesces concurrent single-review retrievals into one VectorStore.search_batch call.
+
+    Callers (request threads, or coroutines via `asearch`) queue their review; a
+    dispatcher thread embeds and searches everything queued as one batch and hands
+    each caller its own (passages, neighbours). While a batch runs, new arrivals
+    queue up for the next one, so under load batches form on their own.
+
+    The window: when requests are arriving concurrently (another one within
+    `max_wait` of the last), the dispatcher holds a batch open until it has
+    `max_batch` reviews or its oldest review has waited `max_wait`, a hard cap on
+    the added latency. A request with no other traffic around it is dispatched
+    straight away.
+
+    Args:
+        vector_store (VectorStore): Store to search.
+        max_batch (int): Most reviews embedded in one batch.
+        max_wait (float): Longest a review waits for others to join its batch (seconds).
+    """
+
+    def __init__(self, vector_store, max_batch=32, max_wait=0.005, metrics=None):
+        self.vector_store = vector_store
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.metrics = metrics or METRICS
+        self._queue = deque()  # (review_text, top_k, labeled_k, future, arrival)
+        self._cond = threading.Condition()
+        self._last_arrival = float("-inf")
+        self._concurrent = False
+        self._thread = None
+        self.batches = 0
+        self.requests = 0
+
+    def submit(self, review_text, top_k=3, labeled_k=0):
+        """Queue one review; returns a Future of (passages, neighbours)."""
+        future = Future()
+        now = time.perf_counter()
+        with self._cond:
+            if self._thread is None:
+                # Started on first use, so a batcher built before a fork runs in the child
+                self._thread = threading.Thread(target=self._run, name="search-batcher", daemon=True)
+                self._thread.start()
+            self._concurrent = now - self._last_arrival < self.max_wait
+            self._last_arrival = now
+            self._queue.append((review_text, top_k, labeled_k, future, now))
+            self._cond.notify()
+        return future
+
+    def search(self, review_text, top_k=3, labeled_k=0, timings=None):
+        """Blocking single-review search through the batcher; same result as search_batch([review_text])[0]."""
+        future = self.submit(review_text, top_k, labeled_k)
+        passages, neighbours, batch_timings = future.result()
+        if timings is not None:
+            for stage, seconds in batch_timings.items():
+                timings[stage] = timings.get(stage, 0.0) + seconds
+        return passages, neighbours
+
+    async def asearch(self, review_text, top_k=3, labeled_k=0, timings=None):
+        """search() for coroutines: waits on the batch without holding a thread."""
+        future = self.submit(review_text, top_k, labeled_k)
+        passages, neighbours, batch_timings = await asyncio.wrap_future(future)
+        if timings is not None:
+            for stage, seconds in batch_timings.items():
+                timings[stage] = timings.get(stage, 0.0) + seconds
+        return passages, neighbours
+
+    def _next_batch(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._queue)
+            if self._concurrent:
+                deadline = self._queue[0][4] + self.max_wait
+                while len(self._queue) < self.max_batch:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            return [self._queue.popleft() for _ in range(min(self.max_batch, len(self._queue)))]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            start = time.perf_counter()
+
+            # One search at the deepest settings asked for; each caller's slice of it
+            # equals what its own search would have returned
+            top_k = max(item[1] for item in batch)
+            labeled_k = max(item[2] for item in batch)
+            timings = {}
+            try:
+                results = self.vector_store.search_batch(
+                    [item[0] for item in batch], top_k=top_k, labeled_k=labeled_k, timings=timings
+                )
+            except Exception as e:
+                for item in batch:
+                    item[3].set_exception(e)
+                continue
+
+            self.batches += 1
+            self.requests += len(batch)
+            self.metrics.inc("search_batches_total")
+            self.metrics.inc("search_batched_requests_total", len(batch))
+            for (_, k, lk, future, arrival), (passages, neighbours) in zip(batch, results):
+                self.metrics.observe("review_stage_seconds", start - arrival, stage="search_batch_wait")
+                future.set_result((passages[:k], neighbours[:lk], {**timings, "search_batch_wait": start - arrival}))
+
+    def stats(self):
+        with self._cond:
+            queued = len(self._queue)
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "queued": queued,
+        }
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_review(text):
+    """Collapse whitespace and case so trivially re-posted reviews share a key."""
+    return re.sub(r"\s+", " ", (text or "")).strip().lower()
+
+
+def make_key(review_text, shop_info, models, top_k, prompt_version, index_version=None):
+    """
+    Content-addressed cache key for one classification.
+
+    Everything that can change the ensemble output goes into the key, so a
+    prompt edit only needs a bump of the prompt version to invalidate old rows,
+    and a reloaded or extended vector index (its `version`) misses old rows too.
+    """
+    payload = json.dumps(
+        {
+            "text": normalize_review(review_text),
+            "shop_info": shop_info or {},
+            "models": list(models),
+            "top_k": top_k,
+            "prompt_version": prompt_version,
+            "index_version": index_version,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ClassificationCache:
+    """
+    Two-tier result cache: in-process LRU in front of an on-disk SQLite store.
+
+    Args:
+        path (str, optional): SQLite file. None keeps the cache in memory only.
+        max_entries (int): LRU size of the in-process tier.
+        max_disk_entries (int): Row cap of the SQLite tier (oldest rows evicted first).
+        ttl (float, optional): Seconds an entry stays valid. None never expires.
+    """
+
+    def __init__(self, path=None, max_entries=10000, max_disk_entries=1000000, ttl=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+
+        self._memory = OrderedDict()  # key -> (created, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._writes = 0
+
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS classifications ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_classifications_created ON classifications(created)"
+            )
+            self._db.commit()
+
+    def _expired(self, created):
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, key):
+        """Return the cached result for `key`, or None on a miss."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if not self._expired(created):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created FROM classifications WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, created = json.loads(row[0]), row[1]
+                    if not self._expired(created):
+                        self._remember(key, created, value)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return value
+                    self._db.execute("DELETE FROM classifications WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """Store a JSON-serialisable result under `key` in both tiers."""
+        created = time.time()
+        with self._lock:
+            self._remember(key, created, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO classifications (key, value, created) VALUES (?, ?, ?)",
+                    (key, json.dumps(value, default=str), created),
+                )
+                self._db.commit()
+                self._writes += 1
+                # Trimming the disk tier is a table scan, so only do it every so often
+                if self._writes % 1000 == 0:
+                    self._evict_disk()
+
+    def _remember(self, key, created, value):
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        if self.ttl is not None:
+            self._db.execute(
+                "DELETE FROM classifications WHERE created < ?", (time.time() - self.ttl,)
+            )
+        self._db.execute(
+            "DELETE FROM classifications WHERE key IN ("
+            "SELECT key FROM classifications ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,),
+        )
+        self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM classifications")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            disk_size = None
+            if self._db is not None:
+                disk_size = self._db.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_size": len(self._memory),
+                "disk_size": disk_size,
+            }
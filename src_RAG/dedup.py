@@ -0,0 +1,144 @@
+import hashlib
+import re
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+_URL = re.compile(r"(https?://\S+|www\.\S+|\S+@\S+\.\w+)", re.IGNORECASE)
+_NON_WORD = re.compile(r"[^\w<>]+")
+
+# Large Mersenne prime for the universal hash family used by MinHash
+_PRIME = np.uint64((1 << 61) - 1)
+
+
+def normalize_for_dedup(text):
+    """Lowercase, mask URLs/e-mails and drop punctuation so templated reviews collapse."""
+    text = _URL.sub(" <url> ", (text or "").lower())
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+class ReviewDeduplicator:
+    """
+    Groups exact and near-duplicate reviews so each group is classified once.
+
+    Exact duplicates (after normalize_for_dedup) are grouped by hash. With a
+    `threshold`, near-duplicates are also grouped: MinHash signatures over
+    character shingles are bucketed with LSH banding, and candidate pairs whose
+    estimated Jaccard similarity reaches `threshold` are merged (union-find).
+
+    Args:
+        threshold (float, optional): Jaccard similarity for near-duplicates. None = exact only.
+        num_perm (int): MinHash signature length.
+        shingle_size (int): Characters per shingle.
+    """
+
+    def __init__(self, threshold=None, num_perm=64, shingle_size=4, seed=42):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # Shingle hashes are 32-bit, so a < 2^32 keeps a * x inside uint64
+        self._a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)
+        if threshold is not None:
+            self.bands, self.rows = self._choose_bands(threshold, num_perm)
+
+    @staticmethod
+    def _choose_bands(threshold, num_perm):
+        # Pick the banding whose S-curve midpoint (1/b)^(1/r) sits just below the
+        # threshold: few missed near-duplicates, candidates are verified anyway
+        best = None
+        for rows in range(1, num_perm + 1):
+            if num_perm % rows:
+                continue
+            bands = num_perm // rows
+            midpoint = (1 / bands) ** (1 / rows)
+            if midpoint <= threshold and (best is None or midpoint > best[0]):
+                best = (midpoint, bands, rows)
+        return (best[1], best[2]) if best else (num_perm, 1)
+
+    def _signature(self, text):
+        k = self.shingle_size
+        shingles = {text[i:i + k] for i in range(max(1, len(text) - k + 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # (a * x + b) mod p for every permutation/shingle pair, minimum per permutation
+        permuted = ((self._a[:, None] * hashes[None, :]) % _PRIME + self._b[:, None]) % _PRIME
+        return permuted.min(axis=1)
+
+    def group(self, texts, keys=None):
+        """
+        Group `texts` into duplicate clusters.
+
+        Args:
+            texts (list[str]): Reviews to group.
+            keys (list, optional): Extra grouping key per text (e.g. serialized
+                shop metadata); texts with different keys are never grouped.
+
+        Returns:
+            list[list[int]]: Groups of input indices, each sorted with its
+                             representative (lowest index) first, ordered by representative.
+        """
+        keys = keys if keys is not None else [None] * len(texts)
+        normalized = [normalize_for_dedup(t) for t in texts]
+
+        parent = list(range(len(texts)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        def union(i, j):
+            ri, rj = find(i), find(j)
+            if ri != rj:
+                parent[max(ri, rj)] = min(ri, rj)
+
+        # Stage 1: exact duplicates
+        first_seen = {}
+        for i, (text, key) in enumerate(zip(normalized, keys)):
+            digest = hashlib.sha1(f"{key}\x00{text}".encode("utf-8")).hexdigest()
+            if digest in first_seen:
+                union(first_seen[digest], i)
+            else:
+                first_seen[digest] = i
+
+        # Stage 2: near-duplicates among the remaining representatives
+        if self.threshold is not None:
+            reps = sorted(first_seen.values())
+            signatures = {i: self._signature(normalized[i]) for i in reps}
+            buckets = defaultdict(list)
+            for i in reps:
+                for band in range(self.bands):
+                    chunk = signatures[i][band * self.rows:(band + 1) * self.rows]
+                    buckets[(keys[i], band, chunk.tobytes())].append(i)
+
+            checked = set()
+            for members in buckets.values():
+                for a_pos in range(len(members)):
+                    for b in members[a_pos + 1:]:
+                        a = members[a_pos]
+                        if (a, b) in checked or find(a) == find(b):
+                            continue
+                        checked.add((a, b))
+                        similarity = float(np.mean(signatures[a] == signatures[b]))
+                        if similarity >= self.threshold:
+                            union(a, b)
+
+        groups = defaultdict(list)
+        for i in range(len(texts)):
+            groups[find(i)].append(i)
+        return [groups[root] for root in sorted(groups)]
+
+    @staticmethod
+    def summarize(groups, total):
+        """Per-batch statistics for a grouping returned by group()."""
+        unique = len(groups)
+        return {
+            "total": total,
+            "unique": unique,
+            "duplicates": total - unique,
+            "largest_group": max((len(g) for g in groups), default=0),
+            "savings": (total - unique) / total if total else 0.0,
+        }
@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import deque
+
+# While a hedgeable call is still queued its start time is unknown; poll for it this often
+_START_POLL = 0.05
+
+
+class TailLatencyConfig:
+    """
+    Tail-latency settings of RAGEnsembleClassifier.
+
+    Args:
+        deadline (float, optional): Seconds per request; models that have not answered
+            by then are reported as timed out and the rest vote.
+        model_deadlines (float or dict, optional): Seconds for every model, or {model: seconds}.
+        hedge_percentile (float, optional): A call running past this percentile of its
+            model's recent latencies gets one duplicate; the first answer wins.
+        hedge_min_samples (int): Calls per model before its percentile is trusted.
+    """
+
+    def __init__(self, deadline=None, model_deadlines=None, hedge_percentile=None, hedge_min_samples=20):
+        self.deadline = deadline
+        self.model_deadlines = model_deadlines
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+
+
+class LatencyTracker:
+    """
+    Rolling window of recent LLM call latencies per model, for hedging thresholds.
+
+    Args:
+        window (int): Latest successful calls kept per model.
+        min_samples (int): Calls needed before a model's percentile is trusted.
+    """
+
+    def __init__(self, window=500, min_samples=20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, model, seconds):
+        with self._lock:
+            samples = self._samples.get(model)
+            if samples is None:
+                samples = self._samples[model] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, model, pct):
+        """`pct`-th percentile latency of `model` in seconds, or None while there are too few samples."""
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if len(samples) < max(1, self.min_samples):
+            return None
+        return samples[min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))]
+
+    def stats(self):
+        """{model: {"samples", "p50_ms", "p95_ms", "p99_ms"}} over the current window."""
+        with self._lock:
+            windows = {m: sorted(samples) for m, samples in self._samples.items()}
+        return {
+            m: {
+                "samples": len(samples),
+                **{f"p{p}_ms": round(samples[int(round(p / 100 * (len(samples) - 1)))] * 1000, 1) for p in (50, 95, 99)},
+            }
+            for m, samples in windows.items() if samples
+        }
+
+
+class ModelCall:
+    """
+    One model's part of an ensemble request: its attempts (the call and at most one
+    hedge), its deadline and, once settled, its entry for model_outputs.
+
+    Attempts are concurrent.futures.Future or asyncio.Task objects; both offer
+    done()/cancelled()/exception()/result()/cancel().
+
+    Args:
+        model (str): Model name.
+        deadline_at (float, optional): time.monotonic() by which it must answer.
+        hedge_after (float, optional): Seconds a running call may take before it is hedged.
+    """
+
+    def __init__(self, model, deadline_at=None, hedge_after=None):
+        self.model = model
+        self.deadline_at = deadline_at
+        self.hedge_after = hedge_after
+        self.attempts = []
+        self.submitted = time.monotonic()
+        self.started = None   # when the first attempt got a slot and called the model
+        self.output = None    # model_outputs entry once settled
+        self.outcome = None   # "ok", "error" or "timeout"
+        self.hedge_won = False
+
+    def expired(self, now):
+        return self.deadline_at is not None and now >= self.deadline_at
+
+    def settle(self, now):
+        """
+        Take the first answer, a failure once every attempt failed, or a timeout once
+        the deadline passed. Returns True when settled; leftover attempts are cancelled
+        (a thread-pool call already running finishes on its own and is discarded).
+        """
+        if self.output is not None:
+            return True
+        errors = []
+        for i, attempt in enumerate(self.attempts):
+            if not attempt.done() or attempt.cancelled():
+                continue
+            if attempt.exception() is not None:
+                errors.append(attempt.exception())
+            elif attempt.result() is not None:
+                self.output, self.outcome, self.hedge_won = attempt.result(), "ok", i > 0
+                break
+        else:
+            if self.attempts and len(errors) == len(self.attempts):
+                self.output = {
+                    "model": self.model,
+                    "label": None,
+                    "rationale": f"Call failed: {errors[0]}",
+                    "error": str(errors[0])
+                }
+                self.outcome = "error"
+            elif self.expired(now):
+                self.output = {
+                    "model": self.model,
+                    "label": None,
+                    "rationale": f"Timed out after {now - self.submitted:.2f}s",
+                    "timed_out": True
+                }
+                self.outcome = "timeout"
+            else:
+                return False
+        for attempt in self.attempts:
+            attempt.cancel()
+        return True
+
+    def hedge_due(self, now):
+        return (self.hedge_after is not None and len(self.attempts) == 1 and self.started is not None
+                and now >= self.started + self.hedge_after)
+
+    def wake_at(self, now):
+        """Next time this call needs looking at without an attempt finishing (inf: none)."""
+        times = [self.deadline_at] if self.deadline_at is not None else []
+        if self.hedge_after is not None and len(self.attempts) == 1:
+            times.append(self.started + self.hedge_after if self.started is not None else now + _START_POLL)
+        return min(times, default=float("inf"))
+
+    def first_error(self):
+        """The exception that failed this call, for callers that must re-raise it."""
+        for attempt in self.attempts:
+            if attempt.done() and not attempt.cancelled() and attempt.exception() is not None:
+                return attempt.exception()
+        return None
@@ -0,0 +1,263 @@
+import csv
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class JobManager:
+    """
+    Asynchronous batch classification jobs with on-disk checkpoints.
+
+    Each job lives in its own directory under `root`:
+        input.json     reviews and shop_info as submitted
+        status.json    state, counts and timestamps
+        results.jsonl  one {"index", "result"} line per finished review (the checkpoint)
+
+    Finished reviews are appended to results.jsonl as they complete, so a job
+    that crashed or was interrupted by a restart resumes with only the missing
+    indices. All jobs share one classifier; at most `max_jobs` run at a time.
+    """
+
+    def __init__(self, classifier, root="cache/jobs", max_jobs=2, resume=True):
+        self.classifier = classifier
+        self.root = root
+        self.executor = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="job")
+        self._status = {}  # job_id -> status dict (source of truth while the process runs)
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        if resume:
+            self.resume_pending()
+
+    # --- Submission ----------------------------------------------------------
+
+    def submit(self, reviews, shop_info=None, show_rationale=False):
+        """
+        Queue a batch and return its job id.
+
+        `reviews` takes the same forms as RAGEnsembleClassifier.classify_batch.
+        """
+        if not isinstance(reviews, list) or not reviews:
+            raise ValueError("reviews must be a non-empty list")
+        # Rejected here rather than failing the job once it runs
+        self.classifier._prepare_tasks(reviews, None)
+        job_id = uuid.uuid4().hex
+        os.makedirs(self._path(job_id))
+        with open(self._path(job_id, "input.json"), 'w', encoding='utf-8') as f:
+            json.dump({"reviews": reviews, "shop_info": shop_info, "show_rationale": show_rationale}, f)
+
+        status = {
+            "id": job_id,
+            "status": QUEUED,
+            "total": len(reviews),
+            "completed": 0,
+            "errors": 0,
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+            "error": None,
+        }
+        with self._lock:
+            self._status[job_id] = status
+        self._write_status(job_id)
+        self.executor.submit(self._run, job_id)
+        return job_id
+
+    def submit_csv(self, csv_file, text_column="text", business_column=None, shop_info=None, show_rationale=False):
+        """
+        Queue every row of a CSV (path, or text/binary file object) such as data/reviews.csv.
+
+        With `business_column` set, rows become (text, business_name) pairs so
+        per-shop metadata from `shop_info` is used.
+        """
+        if isinstance(csv_file, str):
+            with open(csv_file, 'r', encoding='utf-8', newline='') as f:
+                rows = list(csv.DictReader(f))
+        else:
+            content = csv_file.read()
+            if isinstance(content, bytes):
+                content = content.decode('utf-8-sig')
+            rows = list(csv.DictReader(io.StringIO(content)))
+
+        if rows and text_column not in rows[0]:
+            raise ValueError(f"CSV has no '{text_column}' column")
+        if business_column:
+            reviews = [[row[text_column], row.get(business_column)] for row in rows]
+        else:
+            reviews = [row[text_column] for row in rows]
+        return self.submit(reviews, shop_info=shop_info, show_rationale=show_rationale)
+
+    def resume_pending(self):
+        """Re-queue jobs left queued or running by a previous process."""
+        resumed = []
+        for job_id in sorted(os.listdir(self.root)):
+            if not _is_job_id(job_id):
+                continue
+            status = self._read_status(job_id)
+            if status and status["status"] in (QUEUED, RUNNING):
+                status["status"] = QUEUED
+                with self._lock:
+                    self._status[job_id] = status
+                self.executor.submit(self._run, job_id)
+                resumed.append(job_id)
+        if resumed:
+            print(f"Resuming {len(resumed)} unfinished job(s)")
+        return resumed
+
+    # --- Execution -----------------------------------------------------------
+
+    def _run(self, job_id):
+        try:
+            with open(self._path(job_id, "input.json"), 'r', encoding='utf-8') as f:
+                job_input = json.load(f)
+            reviews = job_input["reviews"]
+
+            # Only classify what the checkpoint doesn't already have
+            self._repair_checkpoint(job_id)
+            done = self._load_checkpoint(job_id)
+            pending = [i for i in range(len(reviews)) if i not in done]
+            self._update(
+                job_id,
+                status=RUNNING,
+                started=time.time(),
+                completed=len(done),
+                errors=sum(1 for r in done.values() if r.get("label") == "error"),
+            )
+
+            if pending:
+                dedup_stats = {}
+                with open(self._path(job_id, "results.jsonl"), 'a', encoding='utf-8') as checkpoint:
+                    batch = self.classifier.classify_batch_iter(
+                        [_as_review(reviews[i]) for i in pending],
+                        shop_info=job_input.get("shop_info"),
+                        show_rationale=job_input.get("show_rationale", False),
+                        stats=dedup_stats,
+                    )
+                    for local_index, result in batch:
+                        index = pending[local_index]
+                        checkpoint.write(json.dumps({"index": index, "result": result}, default=str) + "\n")
+                        checkpoint.flush()
+                        with self._lock:
+                            status = self._status[job_id]
+                            status["completed"] += 1
+                            if result.get("label") == "error":
+                                status["errors"] += 1
+                            write_status = status["completed"] % 50 == 0
+                        if write_status:
+                            self._write_status(job_id)
+                self._update(job_id, dedup=dedup_stats)
+
+            self._update(job_id, status=COMPLETED, finished=time.time())
+        except Exception as e:
+            print(f"[Error] Job {job_id} failed: {e}")
+            self._update(job_id, status=FAILED, finished=time.time(), error=str(e))
+
+    # --- Queries -------------------------------------------------------------
+
+    def status(self, job_id):
+        """Current status of a job (with a `progress` fraction), or None if unknown."""
+        if not _is_job_id(job_id):
+            return None
+        with self._lock:
+            status = self._status.get(job_id)
+            status = dict(status) if status else None
+        if status is None:
+            status = self._read_status(job_id)
+        if status is None:
+            return None
+        status["progress"] = status["completed"] / status["total"] if status["total"] else 1.0
+        return status
+
+    def list_jobs(self):
+        statuses = [self.status(job_id) for job_id in sorted(os.listdir(self.root)) if _is_job_id(job_id)]
+        return [status for status in statuses if status]
+
+    def results(self, job_id, offset=0, limit=100):
+        """
+        One page of finished results, ordered by input index.
+
+        Returns:
+            dict: {"id", "offset", "limit", "count", "items": [{"index", "result"}]},
+                  or None if the job doesn't exist.
+        """
+        if self.status(job_id) is None:
+            return None
+        done = self._load_checkpoint(job_id)
+        indices = sorted(done)
+        page = indices[offset:offset + limit]
+        return {
+            "id": job_id,
+            "offset": offset,
+            "limit": limit,
+            "count": len(indices),
+            "items": [{"index": i, "result": done[i]} for i in page],
+        }
+
+    # --- Storage -------------------------------------------------------------
+
+    def _path(self, job_id, name=None):
+        if not _is_job_id(job_id):
+            raise ValueError("Invalid job id")
+        base = os.path.join(self.root, job_id)
+        return os.path.join(base, name) if name else base
+
+    def _load_checkpoint(self, job_id):
+        done = {}
+        try:
+            with open(self._path(job_id, "results.jsonl"), 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn final line from a crash mid-write
+                    done[record["index"]] = record["result"]
+        except FileNotFoundError:
+            pass
+        return done
+
+    def _repair_checkpoint(self, job_id):
+        """Drop a torn final line left by a crash, so appended results start on a fresh line."""
+        try:
+            with open(self._path(job_id, "results.jsonl"), 'rb+') as f:
+                content = f.read()
+                if content and not content.endswith(b"\n"):
+                    f.truncate(content.rfind(b"\n") + 1)
+        except FileNotFoundError:
+            pass
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._status[job_id].update(fields)
+        self._write_status(job_id)
+
+    def _write_status(self, job_id):
+        with self._lock:
+            status = dict(self._status[job_id])
+        tmp_path = self._path(job_id, "status.json.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(status, f)
+        os.replace(tmp_path, self._path(job_id, "status.json"))
+
+    def _read_status(self, job_id):
+        try:
+            with open(self._path(job_id, "status.json"), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+def _is_job_id(name):
+    return len(name) == 32 and all(c in "0123456789abcdef" for c in name)
+
+
+def _as_review(review):
+    # JSON round-trips (text, business_name) tuples as lists
+    return tuple(review) if isinstance(review, list) else review
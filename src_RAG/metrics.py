@@ -0,0 +1,167 @@
+import bisect
+import threading
+import time
+from contextlib import nullcontext
+
+# Latency buckets (seconds) spanning cache hits to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_NULL = nullcontext()
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Stage:
+    """Times one pipeline stage into the registry and/or a per-request breakdown."""
+
+    __slots__ = ("metrics", "name", "labels", "timings", "start")
+
+    def __init__(self, metrics, name, labels, timings):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.timings = timings
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if self.metrics.enabled:
+            self.metrics.observe("review_stage_seconds", elapsed, stage=self.name, **self.labels)
+        if self.timings is not None:
+            key = self.name if not self.labels else f"{self.name}:{':'.join(str(v) for v in self.labels.values())}"
+            self.timings[key] = self.timings.get(key, 0.0) + elapsed
+        return False
+
+
+class Metrics:
+    """
+    Minimal in-process metrics registry rendered in Prometheus text format.
+
+    Counters and histograms are keyed by name and label set; collectors are
+    callables polled at render time for values owned elsewhere (queue depths,
+    pre-filter hit rate). While disabled, every hook is a cheap no-op.
+    """
+
+    def __init__(self, enabled=False, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+
+    def stage(self, name, timings=None, **labels):
+        """
+        Context manager timing a pipeline stage.
+
+        Observed into the review_stage_seconds histogram when enabled, and added
+        to `timings` (a per-request dict of seconds) when one is passed.
+        """
+        if not self.enabled and timings is None:
+            return _NULL
+        return _Stage(self, name, labels, timings)
+
+    def add_collector(self, collector):
+        """
+        Register `collector() -> [(name, type, help, [(labels_dict, value), ...]), ...]`,
+        polled on every render.
+        """
+        self._collectors.append(collector)
+
+    def render(self):
+        """All metrics in Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+            histograms = [(key, (list(h.counts), h.sum, h.count)) for key, h in histograms]
+
+        seen = set()
+
+        def header(name, kind, help_text=None):
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {help_text or self._help.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for (name, labels), (counts, total, count) in histograms:
+            header(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(list(self.buckets) + ["+Inf"], counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        for collector in self._collectors:
+            for name, kind, help_text, samples in collector():
+                header(name, kind, help_text)
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry shared by the classifier, vector store and app; off until enabled
+METRICS = Metrics()
+METRICS.describe("review_stage_seconds", "Time spent in each classification stage")
+METRICS.describe("llm_calls_total", "LLM calls by model and outcome (ok, unknown, error, timeout)")
+METRICS.describe("llm_hedges_total", "Duplicate LLM calls sent after a call passed the hedge percentile")
+METRICS.describe("llm_hedge_wins_total", "Hedged LLM calls answered by the duplicate first")
+METRICS.describe("classifications_total", "Classifications by how they were resolved")
+METRICS.describe("http_requests_total", "HTTP requests by endpoint and status")
+METRICS.describe("http_request_seconds", "HTTP request latency by endpoint")
+METRICS.describe("backend_requests_total", "LLM calls per Ollama host, model and outcome")
+METRICS.describe("backend_retries_total", "LLM calls retried on another Ollama host")
+METRICS.describe("vector_index_reloads_total", "Hot reloads of the vector index after asset changes")
+METRICS.describe("search_batches_total", "Coalesced embedding + FAISS batches run for single-review requests")
+METRICS.describe("search_batched_requests_total", "Single-review retrievals served by coalesced batches")
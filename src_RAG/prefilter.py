@@ -0,0 +1,131 @@
+import bisect
+import json
+import os
+import re
+import threading
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "prefilter_rules.json")
+
+# Joins a batch into one string for a single regex pass; never part of a review
+_SEPARATOR = "\x00"
+
+# Regex rules that may anchor to the start/end of the text (^, $, \A, \Z) are matched
+# per review: in the joined batch string those would only hold for the first/last review.
+# Over-detecting (e.g. "[^a]") only costs a per-review pass, never a wrong answer
+_ANCHOR = re.compile(r"\\[AZ]|(?<!\\)[$^]")
+
+
+class PreFilter:
+    """
+    Rule-based pre-filter compiled into one multi-pattern matcher.
+
+    Rules come from a JSON file mapping each label to a list of rules:
+        {"Advertisement": [{"name": "www", "pattern": "www."},
+                           {"name": "url", "pattern": "https?://", "regex": true}]}
+    Patterns are literal, case-insensitive substrings unless "regex" is true.
+    When several rules match, the one listed first wins (labels in file order),
+    so label priority is controlled by the order of the config.
+
+    Every rule gets a hit counter; stats() reports them alongside how many
+    reviews were checked and matched.
+    """
+
+    def __init__(self, rules):
+        self.rules = []  # list of (label, name, pattern), in priority order
+        for label, label_rules in rules.items():
+            for rule in label_rules:
+                pattern = rule["pattern"] if rule.get("regex") else re.escape(rule["pattern"])
+                re.compile(pattern)  # fail fast on a bad rule, naming the culprit
+                self.rules.append((label, rule.get("name", rule["pattern"]), pattern))
+
+        # One alternation with a named group per rule, each inside a lookahead: the scan
+        # tries every rule at every position, so overlapping hits are all seen and the
+        # lowest-numbered (highest-priority) rule can win
+        anchored = [i for i, (_, _, pattern) in enumerate(self.rules) if _ANCHOR.search(pattern)]
+        self.matcher = self._compile([i for i in range(len(self.rules)) if i not in anchored])
+        self.anchored_matcher = self._compile(anchored)
+
+        self._lock = threading.Lock()
+        self.hits = [0] * len(self.rules)
+        self.checked = 0
+        self.matched = 0
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_RULES_PATH):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def _compile(self, rule_indices):
+        if not rule_indices:
+            return None
+        return re.compile("|".join(f"(?=(?P<r{i}>{self.rules[i][2]}))" for i in rule_indices), re.IGNORECASE)
+
+    @staticmethod
+    def _best_rule(matches, best=None):
+        # Lowest rule index = highest priority
+        for m in matches:
+            rule = int(m.lastgroup[1:])
+            if best is None or rule < best:
+                best = rule
+        return best
+
+    def match(self, review_text):
+        """Return the label of the highest-priority matching rule, or None."""
+        return self.match_batch([review_text])[0]
+
+    def match_batch(self, review_texts):
+        """
+        Apply all rules to a whole batch in one pass.
+
+        The reviews are joined into a single string and scanned once with the
+        combined matcher; match offsets are mapped back to their review. Anchored
+        regex rules are checked review by review. Same answers as match() per review.
+
+        Returns:
+            list: Label (or None) per review, in input order.
+        """
+        texts = [t or "" for t in review_texts]
+        best = [None] * len(texts)
+        if (self.matcher is not None or self.anchored_matcher is not None) and texts:
+            joined = _SEPARATOR.join(texts)
+            starts = []
+            offset = 0
+            for t in texts:
+                starts.append(offset)
+                offset += len(t) + 1
+
+            rescan = set()
+            for m in (self.matcher.finditer(joined) if self.matcher is not None else ()):
+                i = bisect.bisect_right(starts, m.start()) - 1
+                if m.end(m.lastgroup) > starts[i] + len(texts[i]):
+                    # A regex rule ran across the separator: re-check that review on its own
+                    rescan.add(i)
+                    continue
+                rule = int(m.lastgroup[1:])
+                if best[i] is None or rule < best[i]:
+                    best[i] = rule
+            for i in rescan:
+                best[i] = self._best_rule(self.matcher.finditer(texts[i]))
+            if self.anchored_matcher is not None:
+                for i, t in enumerate(texts):
+                    best[i] = self._best_rule(self.anchored_matcher.finditer(t), best[i])
+
+        with self._lock:
+            self.checked += len(texts)
+            for rule in best:
+                if rule is not None:
+                    self.hits[rule] += 1
+                    self.matched += 1
+        return [self.rules[rule][0] if rule is not None else None for rule in best]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "matched": self.matched,
+                "hit_rate": self.matched / self.checked if self.checked else 0.0,
+                "rules": [
+                    {"label": label, "name": name, "hits": hits}
+                    for (label, name, _), hits in zip(self.rules, self.hits)
+                ],
+            }
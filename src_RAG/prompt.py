@@ -0,0 +1,115 @@
+import math
+import re
+
+_PIECES = re.compile(r"\w+|[^\w\s]")
+
+SYSTEM_TEMPLATE = """You are a location review classifier. Use the reference context to classify the review. Only classify the text marked [Review].
+Return JSON ONLY with:
+- 'label' (one of: {labels}), do NOT invent any other label.
+- 'rationale' (short explanation)."""
+
+
+def estimate_tokens(text):
+    """
+    Conservative token estimate without loading a tokenizer.
+
+    Counts words and punctuation as one token each, long words as one token
+    per four characters. BPE tokenizers used by our models come in at or below
+    this for English text, so budgets computed from it don't overflow.
+    """
+    return sum(max(1, math.ceil(len(piece) / 4)) for piece in _PIECES.findall(text or ""))
+
+
+class PromptBuilder:
+    """
+    Builds chat messages for the ensemble within the model's context window.
+
+    Layout is static-first so Ollama can reuse the cached prompt prefix across calls:
+        system: fixed instructions (identical for every review)
+        user:   retrieved context, then shop info, then the review
+
+    The prompt is kept within `num_ctx - reserve_tokens` (room left for the
+    answer): retrieved passages are dropped lowest-ranked first, and only if the
+    review alone still doesn't fit is the review itself truncated.
+
+    Args:
+        labels (list[str]): Allowed labels, listed in the instructions.
+        num_ctx (int): Model context window in tokens.
+        reserve_tokens (int): Tokens kept free for the generated answer.
+        token_counter (callable, optional): text -> token count; defaults to estimate_tokens.
+    """
+
+    def __init__(self, labels, num_ctx=2048, reserve_tokens=512, token_counter=None):
+        self.system_prompt = SYSTEM_TEMPLATE.format(labels=labels)
+        self.num_ctx = num_ctx
+        self.reserve_tokens = reserve_tokens
+        self.count_tokens = token_counter or estimate_tokens
+        # Chat templates add a few tokens of role markup per message
+        self._overhead = self.count_tokens(self.system_prompt) + 16
+
+    @property
+    def budget(self):
+        return self.num_ctx - self.reserve_tokens
+
+    def _user_prompt(self, review_text, passages, shop_info):
+        sections = []
+        if passages:
+            sections.append("Context: These are example reviews and policies (for reference only):\n" + "\n".join(passages))
+        if shop_info:
+            sections.append("Shop Info:\n" + "\n".join(f"- {k}: {v}" for k, v in shop_info.items()))
+        sections.append(f"[Review] Review text to classify:\n{review_text}")
+        return "\n\n".join(sections)
+
+    def build(self, review_text, passages=None, shop_info=None):
+        """
+        Returns:
+            tuple: (messages, info) where messages is the Ollama chat message list
+                   and info reports prompt_tokens, passages_used, passages_dropped
+                   and review_truncated.
+        """
+        passages = list(passages or [])
+        kept = len(passages)
+        user_prompt = self._user_prompt(review_text, passages, shop_info)
+        tokens = self._overhead + self.count_tokens(user_prompt)
+
+        # Trim retrieved context first, least relevant passage first
+        while tokens > self.budget and kept > 0:
+            kept -= 1
+            user_prompt = self._user_prompt(review_text, passages[:kept], shop_info)
+            tokens = self._overhead + self.count_tokens(user_prompt)
+
+        # Then the review itself, keeping its longest beginning that fits. Pieces cost
+        # different numbers of tokens, so search on the measured prompt, and cut the
+        # original text after the last kept piece rather than re-joining pieces
+        truncated = False
+        if tokens > self.budget:
+            truncated = True
+            ends = [m.end() for m in _PIECES.finditer(review_text)]
+
+            def shortened(keep):
+                return review_text[:ends[keep - 1]] + " ..." if keep else "..."
+
+            def prompt_for(keep):
+                user_prompt = self._user_prompt(shortened(keep), [], shop_info)
+                return user_prompt, self._overhead + self.count_tokens(user_prompt)
+
+            low, high = 0, len(ends) - 1  # the whole review is known not to fit
+            while low < high:
+                middle = (low + high + 1) // 2
+                if prompt_for(middle)[1] <= self.budget:
+                    low = middle
+                else:
+                    high = middle - 1
+            user_prompt, tokens = prompt_for(low)
+
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+        info = {
+            "prompt_tokens": tokens,
+            "passages_used": kept,
+            "passages_dropped": len(passages) - kept,
+            "review_truncated": truncated,
+        }
+        return messages, info
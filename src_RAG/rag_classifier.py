@@ -1,142 +1,744 @@
 # src/rag_classifier.py
 import json
 from src_RAG.vector_store import VectorStore
+from src_RAG.cache import make_key
+from src_RAG.scheduler import get_scheduler, INTERACTIVE, BATCH
+from src_RAG.prefilter import PreFilter
+from src_RAG.dedup import ReviewDeduplicator
+from src_RAG.prompt import PromptBuilder
+from src_RAG.metrics import METRICS
+from src_RAG.hedging import LatencyTracker, ModelCall, TailLatencyConfig
 # from vector_store import VectorStore
 import ollama  # make sure ollama Python SDK is installed
-import os 
+import asyncio
 from collections import Counter 
 import re 
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait as wait_futures
+import queue
+import threading
 import time 
 
+# The ensemble when no models are given
+DEFAULT_MODELS = ["llama2:7b", "deepseek-r1:7b", "gemma3:4b"]
+
+# Reasoning traces (deepseek-r1 and friends); an unclosed one was cut off by num_predict
+_THINK = re.compile(r'<think>.*?(</think>|$)', re.DOTALL)
+
 def extract_json(text): 
     """Safely extract JSON from any model output."""
-    match = re.search(r'\{.*\}', text, re.DOTALL)
-    if match:
+    text = _THINK.sub('', text or '').strip()
+    try:
+        # Structured output mode returns bare JSON
+        result = json.loads(text)
+    except json.JSONDecodeError:
+        match = re.search(r'\{.*\}', text, re.DOTALL)
+        if not match:
+            return {"label": "unknown", "rationale": text}
         try:
-            return json.loads(match.group())
+            result = json.loads(match.group())
         except json.JSONDecodeError:
             return {"label": "unknown", "rationale": text}
-    return {"label": "unknown", "rationale": text}
+    if not isinstance(result, dict):
+        return {"label": "unknown", "rationale": text}
+    result["label"] = normalize_label(result.get("label"))
+    result.setdefault("rationale", "")
+    return result
 
 labels = ["Valid", "Advertisement", "Irrelevant Content", "Rant Without Visit"]
+
+def normalize_label(label):
+    """Map a model's label onto `labels` (case-insensitively); anything else is 'unknown'."""
+    if isinstance(label, str):
+        for known in labels:
+            if label.strip().lower() == known.lower():
+                return known
+    return "unknown"
+
+# JSON schema passed as Ollama's `format`: decoding can only produce one of our labels
+OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "label": {"type": "string", "enum": labels},
+        "rationale": {"type": "string"},
+    },
+    "required": ["label", "rationale"],
+}
+
+# Generation caps per model. A label plus a one-line rationale needs well under
+# 150 tokens; reasoning models get extra headroom in case a trace slips through
+DEFAULT_NUM_PREDICT = {"deepseek-r1:7b": 256}
+NUM_PREDICT_FALLBACK = 160
+
+# Models that emit reasoning traces; with think=False Ollama skips them entirely
+REASONING_MODEL_PREFIXES = ("deepseek-r1", "qwen3", "magistral")
+
+# Exemplar labels in assets/exemplars.json mapped onto the classifier labels
+EXEMPLAR_LABELS = {
+    "valid": "Valid",
+    "advertisement": "Advertisement",
+    "irrelevant": "Irrelevant Content",
+    "rant_without_visit": "Rant Without Visit",
+}
+
+# Bump whenever the prompt below changes so cached classifications are invalidated
+PROMPT_VERSION = 3
 # os.environ["OLLAMA_DEVICE"] = "cpu"
 
+# Relative cost of one call per model, used to order the cascade (cheapest first).
+# deepseek-r1 is priced above its size because of its long reasoning traces.
+DEFAULT_MODEL_COSTS = {"gemma3:4b": 4, "llama2:7b": 7, "deepseek-r1:7b": 10}
+
+class GenerationConfig:
+    """
+    How RAGEnsembleClassifier calls its models.
+
+    Args:
+        num_ctx (int): Context window; prompts are budgeted to it.
+        keep_alive (str): How long Ollama keeps a model resident between calls.
+        structured_output (bool): Schema-constrained JSON, capped generation, no reasoning traces.
+        num_predict (int or dict, optional): Generation cap for every model, or {model: cap}.
+    """
+
+    def __init__(self, num_ctx=2048, keep_alive="30m", structured_output=True, num_predict=None):
+        self.num_ctx = num_ctx
+        self.keep_alive = keep_alive
+        self.structured_output = structured_output
+        self.num_predict = num_predict
+
 class RAGEnsembleClassifier:
 
-    def __init__(self, vector_store, models = None, top_k=3):
-        self.model = models or ["llama2:7b","deepseek-r1:7b","gemma3:4b"]
+    def __init__(
+        self,
+        vector_store,
+        models=None,
+        top_k=3,
+        cache=None,
+        cascade=False,
+        model_costs=None,
+        scheduler=None,
+        pre_filter_rules=None,
+        knn_threshold=None,
+        knn_k=3,
+        dedup=True,
+        dedup_threshold=None,
+        generation=None,
+        client=None,
+        metrics=None,
+        async_client=None,
+        search_batcher=None,
+        tail_latency=None,
+    ):
+        self.model = models or list(DEFAULT_MODELS)
         # self.model = models or ["gemma3:4b"]
         self.vector_store = vector_store
         self.top_k = top_k 
+        self.cache = cache  # optional ClassificationCache shared across requests
+        # Optional SearchBatcher: coalesces retrieval for concurrent single-review calls
+        self.search_batcher = search_batcher
+        self.scheduler = scheduler or get_scheduler()  # bounds concurrent calls per model
+
+        # Tail latency (a TailLatencyConfig): per-request and per-model deadlines bound the
+        # ensemble, models that have not answered in time are reported as timed out and the
+        # rest vote; a call running past its model's hedge percentile gets one duplicate
+        tail_latency = tail_latency or TailLatencyConfig()
+        self.deadline = tail_latency.deadline
+        if isinstance(tail_latency.model_deadlines, (int, float)):
+            self.model_deadlines = {m: tail_latency.model_deadlines for m in self.model}
+        else:
+            self.model_deadlines = tail_latency.model_deadlines or {}
+        self.hedge_percentile = tail_latency.hedge_percentile
+        self.latency = LatencyTracker(min_samples=tail_latency.hedge_min_samples)
+
+        # Rule engine for obvious cases: a PreFilter or a path to a rules JSON file
+        if isinstance(pre_filter_rules, PreFilter):
+            self.pre_filter_engine = pre_filter_rules
+        else:
+            self.pre_filter_engine = PreFilter.from_file(pre_filter_rules) if pre_filter_rules else PreFilter.from_file()
+
+        # kNN fast path: answer from labeled exemplars when the nearest ones are similar
+        # enough (cosine >= knn_threshold) and agree. None disables it.
+        self.knn_threshold = knn_threshold
+        self.knn_k = knn_k
+
+        # classify_batch collapses duplicate reviews (exact after normalisation, plus
+        # MinHash near-duplicates at dedup_threshold) and classifies each group once
+        self.deduplicator = ReviewDeduplicator(dedup_threshold) if dedup else None
+
+        # Cascade mode: run the cheapest models first, stop once a majority is decided
+        self.cascade = cascade
+        self.model_costs = model_costs or DEFAULT_MODEL_COSTS
+
+        # Anything with ollama.chat's signature: the ollama module itself, an ollama.Client
+        # for another host, or a local stand-in for benchmarks
+        self.client = client or ollama
+        # Same for the async path (aclassify); an ollama.AsyncClient is created lazily
+        # inside the serving event loop, since its connection pool is bound to that loop
+        self.async_client = async_client
+        self._async_slots = {}
+        self.loaded_models = set()  # filled by warm_up()/awarm_up()
+
+        # Stage timings and counters; hooks are no-ops while the registry is disabled
+        self.metrics = metrics or METRICS
+
+        # Generation (a GenerationConfig): prompts are budgeted to num_ctx, keep_alive keeps
+        # models resident between calls, structured output constrains the answer to our schema
+        generation = generation or GenerationConfig()
+        self.num_ctx = generation.num_ctx
+        self.keep_alive = generation.keep_alive
+        self.structured_output = generation.structured_output
+        if isinstance(generation.num_predict, int):
+            self.num_predict = {m: generation.num_predict for m in self.model}
+        else:
+            self.num_predict = {**DEFAULT_NUM_PREDICT, **(generation.num_predict or {})}
+        reserve = max(self._num_predict(m) for m in self.model)
+        self.prompt_builder = PromptBuilder(labels, num_ctx=self.num_ctx, reserve_tokens=reserve)
 
     def generate(self, prompt, model_name):
-        messages = [{"role": "user", "content": prompt}]
-        response = ollama.chat(
-            model=model_name, 
-            messages=messages, 
-            options={
-                "num_ctx": 2048,
+        """`prompt` is a chat message list from PromptBuilder, or a plain user prompt string."""
+        response = self.client.chat(**self._chat_request(prompt, model_name))
+        return response.get("message", {}).get("content", "")
+
+    async def agenerate(self, prompt, model_name):
+        """generate() on the async client: waiting for the model holds no thread."""
+        response = await self._get_async_client().chat(**self._chat_request(prompt, model_name))
+        return response.get("message", {}).get("content", "")
+
+    def _chat_request(self, prompt, model_name):
+        messages = prompt if isinstance(prompt, list) else [{"role": "user", "content": prompt}]
+        request = {
+            "model": model_name,
+            "messages": messages,
+            "options": {
+                "num_ctx": self.num_ctx,
+                "num_predict": self._num_predict(model_name),
                 "temperature": 0.1,
                 "top_p": 0.9
-            }
-        )
-        return response.get("message", {}).get("content", "")
+            },
+            "keep_alive": self.keep_alive,
+        }
+        if self.structured_output:
+            request["format"] = OUTPUT_SCHEMA
+            if model_name.startswith(REASONING_MODEL_PREFIXES):
+                request["think"] = False
+        return request
+
+    def _get_async_client(self):
+        if self.async_client is None:
+            self.async_client = ollama.AsyncClient()
+        return self.async_client
+
+    def warm_up(self):
+        """
+        Load every ensemble model not loaded yet into the backend, ahead of the first review.
+
+        An empty chat makes Ollama load the model and keep it for `keep_alive`.
+        Returns True once every model is loaded (see `ready`); failures are retried
+        by calling it again.
+        """
+        for model_name in self.model:
+            if model_name in self.loaded_models:
+                continue
+            try:
+                self.client.chat(model=model_name, messages=[], keep_alive=self.keep_alive)
+                self.loaded_models.add(model_name)
+            except Exception as e:
+                print(f"[Warning] Warm-up failed for {model_name}: {e}")
+        return self.ready()
+
+    async def awarm_up(self):
+        """warm_up() on the async client, loading the models concurrently."""
+        async def load(model_name):
+            try:
+                await self._get_async_client().chat(model=model_name, messages=[], keep_alive=self.keep_alive)
+                self.loaded_models.add(model_name)
+            except Exception as e:
+                print(f"[Warning] Warm-up failed for {model_name}: {e}")
+
+        await asyncio.gather(*(load(m) for m in self.model if m not in self.loaded_models))
+        return self.ready()
+
+    def ready(self):
+        """Whether every ensemble model has been loaded by a warm-up."""
+        return all(m in self.loaded_models for m in self.model)
+
+    def _num_predict(self, model_name):
+        return self.num_predict.get(model_name, NUM_PREDICT_FALLBACK)
     
     def pre_filter(self, review_text):
         """
-        Simple Textual pre-filter for obvious cases. 
+        Textual pre-filter for obvious cases, driven by assets/prefilter_rules.json. 
         Expandable and scalable over time. 
         Skips retrieval and inference -> huge speedup. 
         """
-        text = review_text.lower()
-        if "www." in text or "http" in text or "use code" in text:
-            return "Advertisement"
-        if "never been" in text or "haven't visited" in text:
-            return "Rant Without Visit"
-        return None
+        return self.pre_filter_engine.match(review_text)
 
+    def pre_filter_stats(self):
+        """Per-rule hit counters plus the LLM calls the pre-filter has saved so far."""
+        stats = self.pre_filter_engine.stats()
+        stats["llm_calls_saved"] = stats["matched"] * len(self.model)
+        return stats
+
+    def knn_label(self, neighbours, threshold=None):
+        """
+        Label agreed on by the labeled neighbours at or above `threshold`
+        (default self.knn_threshold), or None if there are none or they disagree.
+        """
+        threshold = self.knn_threshold if threshold is None else threshold
+        if threshold is None:
+            return None
+        close = [n for n in neighbours if n["score"] >= threshold]
+        found = {EXEMPLAR_LABELS.get(n["label"], n["label"]) for n in close}
+        return found.pop() if len(found) == 1 else None
+
+    def _knn_result(self, knn_label, neighbours):
+        similarity = max(n["score"] for n in neighbours)
+        return {
+            "label": knn_label,
+            "votes": {knn_label: len(self.model)},
+            "model_outputs": [
+                {"model": m, "label": knn_label, "rationale": f"Matched labeled exemplars (similarity {similarity:.2f})"}
+                for m in self.model
+            ]
+        }
+
+    def _labeled_k(self):
+        return self.knn_k if self.knn_threshold is not None else 0
+
+    def _pre_filter_result(self, pre_label):
+        return {
+            "label": pre_label,
+            "votes": {pre_label: len(self.model)},
+            "model_outputs": [
+                {"model": m, "label": pre_label, "rationale": "Detected by pre-filter"}
+                for m in self.model
+            ]
+        }
+
+    def classify(
+        self,
+        review_text,
+        shop_info=None,
+        show_rationale=True,
+        passages=None,
+        priority=INTERACTIVE,
+        skip_pre_filter=False,
+        neighbours=None,
+        return_timings=False,
+        deadline=None,
+        skip_cache_lookup=False,
+    ):
+        """
+        Classify a single review with the RAG ensemble.
+
+        `passages` and `neighbours` let callers hand in context and labeled neighbours
+        they already retrieved (classify_batch does this with one batched vector store search).
+        `priority` is the scheduler lane, "interactive" or "batch".
+        `skip_pre_filter` and `skip_cache_lookup` are for callers that already ran the
+        pre-filter and the cache lookup over a batch; the result is still cached.
+        `return_timings` adds a per-stage "timings" breakdown (ms) and "resolved_by" to the result.
+        `deadline` (seconds) overrides the classifier's per-request deadline.
+        """
+        timings = {} if return_timings else None
+        deadline_at = self._deadline_at(deadline)
+        with self.metrics.stage("total", timings):
+            result, resolved_by = self._classify(
+                review_text, shop_info, show_rationale, passages, priority, skip_pre_filter, neighbours, timings, deadline_at,
+                skip_cache_lookup
+            )
+        return self._finish(result, resolved_by, timings)
+
+    async def aclassify(
+        self,
+        review_text,
+        shop_info=None,
+        show_rationale=True,
+        passages=None,
+        skip_pre_filter=False,
+        neighbours=None,
+        return_timings=False,
+        deadline=None,
+        skip_cache_lookup=False,
+    ):
+        """
+        Async classify(): same arguments and result, for an asyncio server.
 
-    def classify(self, review_text, shop_info = None, show_rationale = True):
+        Model calls go through the async client, bounded per model by the scheduler's
+        concurrency, so a waiting review costs a coroutine rather than a thread. The
+        CPU-bound steps (pre-filter, cache, retrieval) run in the default executor.
+        """
+        timings = {} if return_timings else None
+        deadline_at = self._deadline_at(deadline)
+        with self.metrics.stage("total", timings):
+            early, cache_key = await asyncio.to_thread(
+                self._lookup, review_text, shop_info, show_rationale, skip_pre_filter, timings, skip_cache_lookup
+            )
+            if early is None:
+                # Waiting for a coalesced retrieval batch holds no executor thread
+                if passages is None and self.search_batcher is not None:
+                    passages, neighbours = await self.search_batcher.asearch(
+                        review_text, top_k=self.top_k, labeled_k=self._labeled_k(), timings=timings
+                    )
+                early, prompt = await asyncio.to_thread(
+                    self._build, review_text, shop_info, show_rationale, passages, neighbours, timings
+                )
+            if early is not None:
+                result, resolved_by = early
+            else:
+                with self.metrics.stage("ensemble", timings):
+                    if self.cascade:
+                        results_dict = await self._arun_cascade(prompt, timings, deadline_at)
+                    else:
+                        results_dict = await self._arun_models(prompt, self.model, timings, deadline_at)
+                result, resolved_by = await asyncio.to_thread(self._vote, results_dict, cache_key, show_rationale, timings)
+        return self._finish(result, resolved_by, timings)
+
+    def _deadline_at(self, deadline=None):
+        """time.monotonic() by which a request started now must be answered, or None."""
+        deadline = self.deadline if deadline is None else deadline
+        return time.monotonic() + deadline if deadline else None
+
+    def _finish(self, result, resolved_by, timings):
+        self.metrics.inc("classifications_total", resolved_by=resolved_by)
+        if timings is not None:
+            result = {
+                **result,
+                "resolved_by": resolved_by,
+                "timings": {stage: round(seconds * 1000, 3) for stage, seconds in timings.items()}
+            }
+        return result
+
+    def _classify(
+        self,
+        review_text,
+        shop_info,
+        show_rationale,
+        passages,
+        priority,
+        skip_pre_filter,
+        neighbours,
+        timings,
+        deadline_at=None,
+        skip_cache_lookup=False,
+    ):
+        """classify() body; returns (result, how it was resolved)."""
+        early, prompt, cache_key = self._prepare(
+            review_text, shop_info, show_rationale, passages, skip_pre_filter, neighbours, timings, skip_cache_lookup
+        )
+        if early is not None:
+            return early
+
+        # Step 3: LLM ensemble
+        with self.metrics.stage("ensemble", timings):
+            if self.cascade:
+                results_dict = self._run_cascade(prompt, priority, timings, deadline_at)
+            else:
+                results_dict = self._run_models(prompt, self.model, priority, timings, deadline_at)
+        return self._vote(results_dict, cache_key, show_rationale, timings)
+
+    def _prepare(
+        self, review_text, shop_info, show_rationale, passages, skip_pre_filter, neighbours, timings, skip_cache_lookup=False
+    ):
+        """
+        Steps before the ensemble. Returns ((result, resolved_by), None, None) when the
+        review was resolved early, else (None, prompt, cache_key).
+        """
+        early, cache_key = self._lookup(review_text, shop_info, show_rationale, skip_pre_filter, timings, skip_cache_lookup)
+        if early is not None:
+            return early, None, None
+        early, prompt = self._build(review_text, shop_info, show_rationale, passages, neighbours, timings)
+        return early, prompt, cache_key
+
+    def _lookup(self, review_text, shop_info, show_rationale, skip_pre_filter, timings, skip_cache_lookup=False):
+        """Pre-filter and cache; returns ((result, resolved_by) or None, cache_key)."""
         
         # Step 0: pre-filter
-        pre_label = self.pre_filter(review_text)
+        with self.metrics.stage("pre_filter", timings):
+            pre_label = None if skip_pre_filter else self.pre_filter(review_text)
         if pre_label:
-            return {
-                "label": pre_label,
-                "votes": {pre_label: len(self.model)},
-                "model_outputs": [
-                    {"model": m, "label": pre_label, "rationale": "Detected by pre-filter"}
-                    for m in self.model
-                ]
-            }
+            return (self._pre_filter_result(pre_label), "pre_filter"), None
+
+        # Step 0.5: result cache for repeated reviews
+        cache_key = None
+        if self.cache is not None:
+            with self.metrics.stage("cache_lookup", timings):
+                cache_key = make_key(
+                    review_text, shop_info, self.model, self.top_k, PROMPT_VERSION, self.vector_store.version
+                )
+                cached = None if skip_cache_lookup else self.cache.get(cache_key)
+            if cached is not None:
+                return ((dict(cached) if show_rationale else {"label": cached["label"]}), "cache"), cache_key
+        return None, cache_key
+
+    def _cached(self, review_text, shop_info, show_rationale):
+        """A batch review's cached result (counted like classify()'s), or None on a miss."""
+        if self.cache is None:
+            return None
+        early, _ = self._lookup(review_text, shop_info, show_rationale, True, None)
+        return self._finish(*early, None) if early is not None else None
+
+    def _build(self, review_text, shop_info, show_rationale, passages, neighbours, timings):
+        """Retrieval (unless `passages` is given), kNN and prompt; returns ((result, resolved_by) or None, prompt)."""
 
         # Step 1 : retrieve top-k passages from vector store 
-        passages = self.vector_store.query(review_text, top_k=self.top_k)
-        context = "\n".join(passages)
-
-        # Optional Metadata of shops 
-        if shop_info:
-            shop_context = "Shop Info:\n"
-            for k, v in shop_info.items():
-                shop_context += f"- {k}: {v}\n"
-        else:
-            shop_context = ""
-
-        # Build the Prompt 
-        prompt = f"""
-        You are a location review classifier. Use the context below to classify the review. Only Classify the [Review]. 
-        Return JSON ONLY with 
-        - 'label' (one of: {labels}), do NOT invent any other label.
-        - 'rationale' (short explanation). 
-        {shop_context}
-        
-        Context: These are example reviews (for reference only): 
-        {context}
-
-        [Review] Review text to calssify:
-        {review_text}
-        """
-        
-        # Multithreaded Option : Collect predictions and rationales in parallel 
-        results = []
-        def worker(model_name):
-            output_text = self.generate(prompt, model_name)
-            result = extract_json(output_text)
-            return {
-                "model": model_name,
-                "label": result["label"],
-                "rationale": result["rationale"]
+        if passages is None and self.search_batcher is not None:
+            passages, neighbours = self.search_batcher.search(
+                review_text, top_k=self.top_k, labeled_k=self._labeled_k(), timings=timings
+            )
+        elif passages is None:
+            passages, neighbours = self.vector_store.search_batch(
+                [review_text], top_k=self.top_k, labeled_k=self._labeled_k(), timings=timings
+            )[0]
+
+        # Step 1.5: kNN fast path over labeled exemplars, skips the LLM ensemble
+        knn_label = self.knn_label(neighbours or [])
+        if knn_label:
+            result = self._knn_result(knn_label, neighbours)
+            return ((result if show_rationale else {"label": knn_label}), "knn"), None
+
+        # Step 2: build the prompt within the context budget (static prefix, context,
+        # optional shop metadata, then the review)
+        with self.metrics.stage("prompt_build", timings):
+            prompt, prompt_info = self.prompt_builder.build(review_text, passages, shop_info)
+        if prompt_info["passages_dropped"] or prompt_info["review_truncated"]:
+            print(f"[Warning] Prompt over budget: dropped {prompt_info['passages_dropped']} passage(s), "
+                  f"review truncated: {prompt_info['review_truncated']}")
+        return None, prompt
+
+    def _vote(self, results_dict, cache_key, show_rationale, timings):
+        """Majority vote over the ensemble outputs; returns (result, "ensemble"), or "quorum" when models are missing."""
+        # Order results according to self.model (skipped cascade models keep their slot)
+        results = [
+            results_dict.get(m) or {
+                "model": m,
+                "label": None,
+                "rationale": "Skipped by cascade: majority already decided",
+                "skipped": True
             }
-
-        # Submit all models to the executor
-        with ThreadPoolExecutor() as executor:
-            futures = {executor.submit(worker, m): m for m in self.model}
-            
-            # Collect results in the same order as self.model
-            results_dict = {}
-            for future in as_completed(futures):
-                model_name = futures[future]
-                results_dict[model_name] = future.result()
-
-        # Order results according to self.model
-        results = [results_dict[m] for m in self.model]
-
-        # Majority voting
-        vote_counts = Counter([r["label"] for r in results])
-        majority_label = vote_counts.most_common(1)[0][0]
+            for m in self.model
+        ]
+
+        # Majority voting over the models that answered; skipped, failed and timed-out
+        # models have no label. Without any answer the review stays "unknown"
+        with self.metrics.stage("voting", timings):
+            vote_counts = Counter([r["label"] for r in results if r["label"] is not None])
+            majority_label = vote_counts.most_common(1)[0][0] if vote_counts else "unknown"
+
+        full_result = {
+            "label": majority_label,
+            "votes": vote_counts,
+            "model_outputs": results
+        }
+        # A partial quorum is answered but not cached, so the review gets a full vote next time
+        partial = any(r.get("timed_out") or r.get("error") for r in results)
+        resolved_by = "quorum" if partial else "ensemble"
+        if cache_key is not None and not partial:
+            self.cache.put(cache_key, {**full_result, "votes": dict(vote_counts)})
 
         # Return final label, optionally include rationale and vote breakdown
         if show_rationale:
-            return {
-                "label": majority_label,
-                "votes": vote_counts,
-                "model_outputs": results
-            }
+            return full_result, resolved_by
         else:
-            return {"label": majority_label}
+            return {"label": majority_label}, resolved_by
 
-    def classify_batch(self, reviews, shop_info=None, show_rationale=False, sleep=0.0):
+    def _run_models(self, prompt, model_names, priority=INTERACTIVE, timings=None, deadline_at=None):
+        """
+        Query `model_names` in parallel through the shared scheduler and return {model: output}.
+
+        Waits until `deadline_at` (time.monotonic()) or each model's own deadline at the
+        latest; a model that misses it gets a timed-out entry, one whose call failed an
+        error entry, and the caller votes with the rest. Fails only when every model
+        failed. Interactive calls running past their model's hedge percentile are
+        duplicated once. A call that already started when it timed out or lost to its
+        hedge keeps its scheduler slot until the backend answers; bound hung calls with
+        a client timeout (e.g. OllamaPool's).
+        """
+        def worker(call):
+            if call.output is not None:
+                return None  # answered by the other attempt while this one was queued
+            start = time.monotonic()
+            if call.started is None:
+                call.started = start
+            try:
+                with self.metrics.stage("generate", timings, model=call.model):
+                    output_text = self.generate(prompt, call.model)
+            except Exception:
+                self.metrics.inc("llm_calls_total", model=call.model, outcome="error")
+                raise
+            self.latency.record(call.model, time.monotonic() - start)
+            return self._model_output(call.model, output_text)
+
+        def submit(call):
+            # A full lane is waited on until the call's deadline at most, and never for a hedge
+            hedge = bool(call.attempts)
+            timeout = None if call.deadline_at is None else max(0.0, call.deadline_at - time.monotonic())
+            try:
+                future = self.scheduler.submit(call.model, worker, call, priority=priority, timeout=0 if hedge else timeout)
+                call.attempts.append(future)
+            except queue.Full:
+                if hedge:
+                    call.hedge_after = None  # no room to hedge; let the first attempt run
+                else:
+                    call.settle(max(time.monotonic(), call.deadline_at))  # times out
+
+        # Collect predictions and rationales in parallel 
+        calls = self._model_calls(model_names, deadline_at, hedge=priority == INTERACTIVE)
+        pending, timeout = self._supervise(calls, submit)
+        while pending:
+            wait_futures(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            pending, timeout = self._supervise(calls, submit)
+        return self._collect(calls)
+
+    async def _arun_models(self, prompt, model_names, timings=None, deadline_at=None):
+        """_run_models() on the async client; at most the scheduler's concurrency per model."""
+        async def worker(call):
+            async with self._async_slot(call.model):
+                if call.output is not None:
+                    return None
+                start = time.monotonic()
+                if call.started is None:
+                    call.started = start
+                try:
+                    with self.metrics.stage("generate", timings, model=call.model):
+                        output_text = await self.agenerate(prompt, call.model)
+                except Exception:
+                    self.metrics.inc("llm_calls_total", model=call.model, outcome="error")
+                    raise
+            self.latency.record(call.model, time.monotonic() - start)
+            return self._model_output(call.model, output_text)
+
+        def submit(call):
+            task = asyncio.ensure_future(worker(call))
+            # A losing hedge may fail after the vote; mark its exception as retrieved
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            call.attempts.append(task)
+
+        calls = self._model_calls(model_names, deadline_at, hedge=True)
+        pending, timeout = self._supervise(calls, submit)
+        while pending:
+            await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            pending, timeout = self._supervise(calls, submit)
+        return self._collect(calls)
+
+    def _model_calls(self, model_names, deadline_at, hedge):
+        """A ModelCall per model with its effective deadline and hedge threshold."""
+        now = time.monotonic()
+        calls = []
+        for model_name in model_names:
+            model_deadline_at = deadline_at
+            if self.model_deadlines.get(model_name):
+                model_deadline_at = min(d for d in (deadline_at, now + self.model_deadlines[model_name]) if d is not None)
+            hedge_after = None
+            if hedge and self.hedge_percentile:
+                hedge_after = self.latency.percentile(model_name, self.hedge_percentile)
+            calls.append(ModelCall(model_name, model_deadline_at, hedge_after))
+        return calls
+
+    def _supervise(self, calls, submit):
+        """
+        One pass over the in-flight calls: start the ones not started yet, settle the
+        answered, failed and expired ones, and hedge the slow ones. Returns the attempts
+        still pending and how long to wait for one of them (None: until one finishes).
+        """
+        now = time.monotonic()
+        pending, wake_at = [], float("inf")
+        for call in calls:
+            if call.output is not None:
+                continue
+            if not call.attempts and not call.expired(now):
+                submit(call)
+            if call.settle(now):
+                if call.outcome == "timeout":
+                    self.metrics.inc("llm_calls_total", model=call.model, outcome="timeout")
+                if call.hedge_won:
+                    self.metrics.inc("llm_hedge_wins_total", model=call.model)
+                continue
+            if call.hedge_due(now):
+                submit(call)
+                if len(call.attempts) > 1:
+                    self.metrics.inc("llm_hedges_total", model=call.model)
+            pending.extend(a for a in call.attempts if not a.done())
+            wake_at = min(wake_at, call.wake_at(now))
+        timeout = None if wake_at == float("inf") else max(0.0, wake_at - now)
+        return pending, timeout
+
+    @staticmethod
+    def _collect(calls):
+        """{model: output} of settled calls; raises the first error when every model failed."""
+        if calls and all(call.outcome == "error" for call in calls):
+            raise calls[0].first_error()
+        return {call.model: call.output for call in calls}
+
+    def _async_slot(self, model_name):
+        slot = self._async_slots.get(model_name)
+        if slot is None:
+            limit = self.scheduler.model_concurrency.get(model_name, self.scheduler.concurrency)
+            slot = self._async_slots[model_name] = asyncio.Semaphore(limit)
+        return slot
+
+    def _model_output(self, model_name, output_text):
+        result = extract_json(output_text)
+        self.metrics.inc("llm_calls_total", model=model_name, outcome="unknown" if result["label"] == "unknown" else "ok")
+        return {
+            "model": model_name,
+            "label": result["label"],
+            "rationale": result["rationale"]
+        }
+
+    def cascade_order(self):
+        """Ensemble models sorted cheapest first; unknown costs go last, ties keep self.model order."""
+        return sorted(self.model, key=lambda m: self.model_costs.get(m, float("inf")))
+
+    def _run_cascade(self, prompt, priority=INTERACTIVE, timings=None, deadline_at=None):
+        """
+        Early-exit ensemble: start with just enough of the cheapest models to form
+        a majority and escalate one model at a time only while no real label has one.
+        Once a label holds a strict majority the remaining models cannot change the vote.
+        Escalation shares the request's deadline; models it never reached are reported as timed out.
+        """
+        order = self.cascade_order()
+        needed = len(self.model) // 2 + 1
+
+        results_dict = self._run_models(prompt, order[:needed], priority, timings, deadline_at)
+        remaining = order[needed:]
+        while remaining and not self._majority_decided(results_dict, needed) and not self._expired(deadline_at):
+            results_dict.update(self._run_models(prompt, remaining[:1], priority, timings, deadline_at))
+            remaining = remaining[1:]
+        return self._unreached(results_dict, remaining, needed)
+
+    async def _arun_cascade(self, prompt, timings=None, deadline_at=None):
+        """_run_cascade() on the async client."""
+        order = self.cascade_order()
+        needed = len(self.model) // 2 + 1
+
+        results_dict = await self._arun_models(prompt, order[:needed], timings, deadline_at)
+        remaining = order[needed:]
+        while remaining and not self._majority_decided(results_dict, needed) and not self._expired(deadline_at):
+            results_dict.update(await self._arun_models(prompt, remaining[:1], timings, deadline_at))
+            remaining = remaining[1:]
+        return self._unreached(results_dict, remaining, needed)
+
+    @staticmethod
+    def _majority_decided(results_dict, needed):
+        counts = Counter(r["label"] for r in results_dict.values() if r["label"] is not None)
+        return any(count >= needed for label, count in counts.items() if label != "unknown")
+
+    def _unreached(self, results_dict, remaining, needed):
+        """Report the models a cascade still needed but ran out of time for."""
+        if remaining and not self._majority_decided(results_dict, needed):
+            for model_name in remaining:
+                results_dict[model_name] = {
+                    "model": model_name,
+                    "label": None,
+                    "rationale": "Not reached before the deadline",
+                    "timed_out": True
+                }
+        return results_dict
+
+    @staticmethod
+    def _expired(deadline_at):
+        return deadline_at is not None and time.monotonic() >= deadline_at
+
+    def classify_batch(self, reviews, shop_info=None, show_rationale=False, sleep=0.0, return_stats=False):
         """
         Classify a list of reviews with optional shop-specific metadata.
 
@@ -146,12 +748,194 @@ class RAGEnsembleClassifier:
                 - list of (review_text, business_name) → lookup per shop
             shop_info (dict, optional): Full metadata dict, e.g. from metadata.py
             show_rationale (bool): Whether to include rationale and vote breakdown.
-            sleep (float): Optional delay between reviews (seconds).
+            sleep (float): Optional delay between starting consecutive reviews (seconds).
+            return_stats (bool): Also return the batch's deduplication statistics.
 
         Returns:
-            list[dict]: List of classification outputs.
+            list[dict]: List of classification outputs, or (outputs, dedup_stats)
+                        when return_stats is set.
+        """
+        ordered_results = [None] * len(reviews)
+        stats = {}
+        for index, result in self.classify_batch_iter(reviews, shop_info, show_rationale, sleep, stats=stats):
+            ordered_results[index] = result
+        if return_stats:
+            return ordered_results, stats
+        return ordered_results
+
+    def classify_batch_iter(self, reviews, shop_info=None, show_rationale=False, sleep=0.0, retrieval_chunk=256, stats=None):
+        """
+        Streaming variant of classify_batch.
+
+        Yields (input_index, result) pairs as soon as each review finishes, i.e. in
+        completion order. Takes the same arguments as classify_batch; context is
+        retrieved in batched chunks of `retrieval_chunk` reviews so the first
+        results don't wait for the whole batch to be embedded.
+
+        Duplicate reviews are classified once by their group's representative and the
+        result is yielded for every member; copies carry "duplicate_of" with the
+        representative's index. Pass a dict as `stats` to receive the dedup statistics
+        before the first result is yielded.
+        """
+        tasks = self._prepare_tasks(reviews, shop_info)
+        if not tasks:
+            return
+
+        groups = self._group_tasks(tasks)
+        members = {group[0]: group for group in groups}
+        representatives = [group[0] for group in groups]
+        if stats is not None:
+            stats.update(ReviewDeduplicator.summarize(groups, len(tasks)))
+
+        done = queue.Queue()
+        stop = threading.Event()
+
+        # Run in parallel. The scheduler bounds the actual LLM concurrency; these threads
+        # only need to keep its queues fed, so size the pool to twice its capacity
+        max_workers = max(2, 2 * self.scheduler.capacity(self.model))
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+
+        def feed():
+            try:
+                for start in range(0, len(representatives), retrieval_chunk):
+                    chunk = representatives[start:start + retrieval_chunk]
+
+                    # One vectorized pre-filter pass over the chunk, then the result cache;
+                    # matched and cached reviews are answered straight away without
+                    # retrieval or LLM calls
+                    pre_labels = self.pre_filter_engine.match_batch([tasks[i][0] for i in chunk])
+                    needs_context = []
+                    for i, pre_label in zip(chunk, pre_labels):
+                        result = self._pre_filter_result(pre_label) if pre_label else self._cached(*tasks[i], show_rationale)
+                        if result is not None:
+                            future = Future()
+                            future.set_result(result)
+                            done.put((i, future))
+                        else:
+                            needs_context.append(i)
+
+                    # Retrieve context for the rest of the chunk in one batched query, so the
+                    # worker threads never contend for the embedding model
+                    contexts = dict(zip(
+                        needs_context,
+                        self.vector_store.search_batch([tasks[i][0] for i in needs_context], top_k=self.top_k, labeled_k=self._labeled_k())
+                    )) if needs_context else {}
+
+                    for i in needs_context:
+                        if stop.is_set():
+                            return
+                        review_text, metadata = tasks[i]
+                        passages, neighbours = contexts[i]
+                        future = executor.submit(
+                            self.classify, review_text, metadata, show_rationale,
+                            passages=passages, neighbours=neighbours, priority=BATCH, skip_pre_filter=True,
+                            skip_cache_lookup=True
+                        )
+                        future.add_done_callback(lambda f, i=i: done.put((i, f)))
+                        if sleep:
+                            time.sleep(sleep)
+            except Exception as e:
+                # Fail whatever was not submitted rather than leaving the consumer waiting
+                print(f"[Error] Batch submission failed: {e}")
+                done.put((None, e))
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+
+        try:
+            remaining = set(representatives)
+            while remaining:
+                index, future = done.get()
+                if index is None:
+                    for rep_index in sorted(remaining):
+                        for i in members[rep_index]:
+                            yield i, {"label": "error", "error": str(future)}
+                    return
+                remaining.discard(index)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"[Error] Classification failed: {e}")
+                    result = {"label": "error", "error": str(e)}
+                yield index, result
+                for i in members[index][1:]:
+                    yield i, {**result, "duplicate_of": index}
+        finally:
+            # Consumer went away (e.g. client disconnected): stop queueing new reviews
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def aclassify_batch(self, reviews, shop_info=None, show_rationale=False, return_stats=False):
+        """
+        Async classify_batch(): same arguments and result.
+
+        Every unique review is in flight at once as a coroutine; the per-model slots
+        of aclassify keep the backend at its concurrency limit. Pre-filtering,
+        deduplication and one batched retrieval run in the default executor first.
+        """
+        tasks = self._prepare_tasks(reviews, shop_info)
+        if not tasks:
+            return ([], {}) if return_stats else []
+
+        def retrieve():
+            groups = self._group_tasks(tasks)
+            representatives = [group[0] for group in groups]
+            pre_labels = self.pre_filter_engine.match_batch([tasks[i][0] for i in representatives])
+            # Cache hits skip retrieval too
+            cached = {}
+            for i, pre_label in zip(representatives, pre_labels):
+                result = None if pre_label else self._cached(*tasks[i], show_rationale)
+                if result is not None:
+                    cached[i] = result
+            needs_context = [i for i, pre_label in zip(representatives, pre_labels) if not pre_label and i not in cached]
+            contexts = self.vector_store.search_batch(
+                [tasks[i][0] for i in needs_context], top_k=self.top_k, labeled_k=self._labeled_k()
+            ) if needs_context else []
+            return groups, pre_labels, cached, dict(zip(needs_context, contexts))
+
+        groups, pre_labels, cached, contexts = await asyncio.to_thread(retrieve)
+
+        async def run(index, pre_label):
+            if pre_label:
+                return self._pre_filter_result(pre_label)
+            if index in cached:
+                return cached[index]
+            review_text, metadata = tasks[index]
+            passages, neighbours = contexts[index]
+            try:
+                return await self.aclassify(
+                    review_text, metadata, show_rationale, passages=passages, neighbours=neighbours, skip_pre_filter=True,
+                    skip_cache_lookup=True
+                )
+            except Exception as e:
+                print(f"[Error] Classification failed: {e}")
+                return {"label": "error", "error": str(e)}
+
+        outputs = await asyncio.gather(*(run(group[0], pre_label) for group, pre_label in zip(groups, pre_labels)))
+
+        ordered_results = [None] * len(tasks)
+        for group, result in zip(groups, outputs):
+            ordered_results[group[0]] = result
+            for i in group[1:]:
+                ordered_results[i] = {**result, "duplicate_of": group[0]}
+        if return_stats:
+            return ordered_results, ReviewDeduplicator.summarize(groups, len(tasks))
+        return ordered_results
+
+    def _group_tasks(self, tasks):
+        """
+        Collapse duplicates: only group representatives go through the pipeline.
+        Reviews with different shop metadata are never grouped together.
         """
+        if self.deduplicator is None:
+            return [[i] for i in range(len(tasks))]
+        return self.deduplicator.group(
+            [review_text for review_text, _ in tasks],
+            keys=[json.dumps(metadata, sort_keys=True, default=str) for _, metadata in tasks]
+        )
 
+    def _prepare_tasks(self, reviews, shop_info):
+        """Normalise classify_batch input into a list of (review_text, metadata)."""
         tasks = []
 
         # Case 1: reviews is list of strings
@@ -160,7 +944,7 @@ class RAGEnsembleClassifier:
                 tasks.append((review, shop_info or {}))  # just pass global shop_info dict
 
         # Case 2: reviews is list of (review_text, business_name)
-        elif all(isinstance(r, tuple) and len(r) == 2 for r in reviews):
+        elif all(isinstance(r, (tuple, list)) and len(r) == 2 for r in reviews):
             for review_text, business_name in reviews:
                 metadata = {}
                 if shop_info:  # lookup if dict provided
@@ -168,25 +952,7 @@ class RAGEnsembleClassifier:
                 tasks.append((review_text, metadata))
         else:
             raise ValueError("Reviews must be list of strings OR list of (review_text, business_name) tuples")
-
-        # Run in parallel
-        with ThreadPoolExecutor(max_workers=os.cpu_count() or 4) as executor:
-            futures = {
-                executor.submit(self.classify, review_text, metadata, show_rationale): (review_text, metadata)
-                for review_text, metadata in tasks
-            }
-
-        ordered_results = []
-
-        for future in futures:
-            try:
-                result = future.result()
-                ordered_results.append(result)
-            except Exception as e:
-                print(f"[Error] Classification failed: {e}")
-                ordered_results.append({"label": "error", "error": str(e)})
-
-        return ordered_results
+        return tasks
 
 if __name__ == "__main__":
     # Load vector store
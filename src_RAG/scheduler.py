@@ -0,0 +1,190 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+
+class TokenBucket:
+    """Simple token bucket: `rate` calls per second with bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class _ModelLane:
+    """Queues and worker threads for one model."""
+
+    def __init__(self, model, concurrency, max_queue, rate_limit, interactive_weight):
+        self.model = model
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.interactive_weight = interactive_weight
+        self.bucket = TokenBucket(rate_limit, burst=concurrency) if rate_limit else None
+
+        self.queues = {INTERACTIVE: deque(), BATCH: deque()}
+        self.cond = threading.Condition()
+        self.in_flight = 0
+        self.completed = 0
+        self._interactive_streak = 0
+
+        for i in range(concurrency):
+            threading.Thread(target=self._work, name=f"infer-{model}-{i}", daemon=True).start()
+
+    def queued(self):
+        return len(self.queues[INTERACTIVE]) + len(self.queues[BATCH])
+
+    def put(self, item, priority, timeout):
+        with self.cond:
+            # Backpressure: block the producer until the lane has room
+            if not self.cond.wait_for(lambda: self.queued() < self.max_queue, timeout=timeout):
+                raise queue.Full(f"Inference queue for {self.model} is full")
+            self.queues[priority].append(item)
+            self.cond.notify_all()
+        # A call cancelled while queued (timed out, or beaten by its hedge) gives its place back at once
+        item[0].add_done_callback(lambda future: self._discard(item, priority))
+
+    def _discard(self, item, priority):
+        if not item[0].cancelled():
+            return
+        with self.cond:
+            try:
+                self.queues[priority].remove(item)
+            except ValueError:
+                return  # already taken by a worker, which skips it
+            self.cond.notify_all()
+
+    def _next(self):
+        # Weighted round-robin: interactive requests go first, but a waiting batch
+        # task is let through after every `interactive_weight` interactive ones
+        interactive, batch = self.queues[INTERACTIVE], self.queues[BATCH]
+        if interactive and (not batch or self._interactive_streak < self.interactive_weight):
+            self._interactive_streak += 1
+            return interactive.popleft()
+        self._interactive_streak = 0
+        return batch.popleft()
+
+    def _work(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(self.queued)
+                future, fn, args, kwargs = self._next()
+                self.in_flight += 1
+                self.cond.notify_all()  # wake producers blocked on a full queue
+
+            if future.set_running_or_notify_cancel():
+                if self.bucket is not None:
+                    self.bucket.acquire()
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+
+            with self.cond:
+                self.in_flight -= 1
+                self.completed += 1
+
+
+class InferenceScheduler:
+    """
+    Process-wide scheduler for LLM calls.
+
+    Every model gets a fixed number of worker threads (its concurrency limit) fed
+    from a bounded queue, so however many reviews are in flight the backend never
+    sees more than `concurrency` simultaneous calls per model.
+
+    Args:
+        concurrency (int): Default concurrent calls per model. Defaults to
+            OLLAMA_NUM_PARALLEL, i.e. what a single Ollama server actually runs in parallel.
+        model_concurrency (dict, optional): Per-model overrides of `concurrency`.
+        max_queue (int): Queued calls per model before `submit` blocks (backpressure).
+        rate_limit (float, optional): Max calls per second per model.
+        interactive_weight (int): Interactive calls served for every batch call when both wait.
+    """
+
+    def __init__(self, concurrency=None, model_concurrency=None, max_queue=64, rate_limit=None, interactive_weight=4):
+        self.concurrency = concurrency or int(os.environ.get("OLLAMA_NUM_PARALLEL", 1))
+        self.model_concurrency = model_concurrency or {}
+        self.max_queue = max_queue
+        self.rate_limit = rate_limit
+        self.interactive_weight = interactive_weight
+        self._lanes = {}
+        self._lock = threading.Lock()
+
+    def _lane(self, model):
+        with self._lock:
+            lane = self._lanes.get(model)
+            if lane is None:
+                lane = _ModelLane(
+                    model,
+                    self.model_concurrency.get(model, self.concurrency),
+                    self.max_queue,
+                    self.rate_limit,
+                    self.interactive_weight,
+                )
+                self._lanes[model] = lane
+            return lane
+
+    def submit(self, model, fn, *args, priority=INTERACTIVE, timeout=None, **kwargs):
+        """
+        Queue `fn(*args, **kwargs)` as a call against `model` and return a Future.
+
+        Blocks while the model's queue is full; raises queue.Full after `timeout` seconds.
+        """
+        if priority not in (INTERACTIVE, BATCH):
+            raise ValueError(f"priority must be '{INTERACTIVE}' or '{BATCH}'")
+        future = Future()
+        self._lane(model).put((future, fn, args, kwargs), priority, timeout)
+        return future
+
+    def capacity(self, models):
+        """Total concurrent calls the scheduler will run across `models`."""
+        return sum(self.model_concurrency.get(m, self.concurrency) for m in models)
+
+    def stats(self):
+        with self._lock:
+            lanes = list(self._lanes.values())
+        stats = {}
+        for lane in lanes:
+            with lane.cond:
+                stats[lane.model] = {
+                    "concurrency": lane.concurrency,
+                    "queued_interactive": len(lane.queues[INTERACTIVE]),
+                    "queued_batch": len(lane.queues[BATCH]),
+                    "in_flight": lane.in_flight,
+                    "completed": lane.completed,
+                }
+        return stats
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Shared process-wide scheduler used by every classifier that isn't given its own."""
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            _default_scheduler = InferenceScheduler()
+        return _default_scheduler
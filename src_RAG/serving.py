@@ -0,0 +1,127 @@
+import math
+import os
+
+import ollama
+
+from src_RAG.rag_classifier import RAGEnsembleClassifier, DEFAULT_MODELS
+from src_RAG.hedging import TailLatencyConfig
+from src_RAG.vector_store import VectorStore
+from src_RAG.batcher import SearchBatcher
+from src_RAG.backends import OllamaPool
+from src_RAG.scheduler import InferenceScheduler
+from src_RAG.metrics import METRICS
+
+# Setup shared by the Flask (app.py) and Starlette (asgi.py) apps, configured from the environment
+
+
+def build_vector_store():
+    """
+    VectorStore over assets/. The embedding model is not loaded here: the apps load it
+    in their warm-up (or before forking), otherwise the first request does.
+
+    VECTOR_INDEX_TYPE=ivf|hnsw for large exemplar corpora (VECTOR_EXTRA_EXEMPLARS: comma-separated
+    JSON/CSV files, e.g. data/reviews_dataset.csv). EMBEDDING_BACKEND=int8|onnx|onnx-int8 embeds
+    on CPU-only nodes.
+    """
+    return VectorStore(
+        "assets/policies.md", "assets/exemplars.json",
+        index_type=os.environ.get("VECTOR_INDEX_TYPE", "flat"),
+        extra_exemplars=[p for p in os.environ.get("VECTOR_EXTRA_EXEMPLARS", "").split(",") if p],
+        embedding_backend=os.environ.get("EMBEDDING_BACKEND", "torch"),
+    )
+
+
+def watch_assets(vs):
+    """Hot-reload the index when assets/ changes; VECTOR_INDEX_WATCH=0 turns it off."""
+    interval = float(os.environ.get("VECTOR_INDEX_WATCH", 5))
+    if interval > 0:
+        vs.watch(interval)
+
+
+def build_classifier(vs, cache):
+    """
+    The served RAGEnsembleClassifier over `vs` and `cache`.
+
+    - Concurrent requests share one embedding + FAISS batch, waiting at most
+      SEARCH_BATCH_WAIT_MS for company (SEARCH_BATCH_SIZE=1 turns coalescing off).
+    - Tail latency: REQUEST_DEADLINE (seconds) bounds each review's ensemble, which then
+      votes with the models that answered in time; HEDGE_PERCENTILE (e.g. 95) duplicates
+      model calls running slower than that percentile of their recent latencies.
+    - OLLAMA_BACKENDS=path/to/backends.json spreads the ensemble over several Ollama hosts.
+
+    Returns:
+        tuple: (classifier, OllamaPool or None)
+    """
+    search_batcher = SearchBatcher(
+        vs,
+        max_batch=int(os.environ.get("SEARCH_BATCH_SIZE", 32)),
+        max_wait=float(os.environ.get("SEARCH_BATCH_WAIT_MS", 5)) / 1000,
+    )
+    tail_latency = TailLatencyConfig(
+        deadline=float(os.environ["REQUEST_DEADLINE"]) if os.environ.get("REQUEST_DEADLINE") else None,
+        hedge_percentile=float(os.environ["HEDGE_PERCENTILE"]) if os.environ.get("HEDGE_PERCENTILE") else None,
+    )
+    if not os.environ.get("OLLAMA_BACKENDS"):
+        # A call still running at the deadline holds its scheduler slot until Ollama answers;
+        # the client timeout bounds that (an OllamaPool takes a "timeout" in its config)
+        clients = {}
+        if tail_latency.deadline:
+            clients = {
+                "client": ollama.Client(timeout=tail_latency.deadline),
+                "async_client": ollama.AsyncClient(timeout=tail_latency.deadline),
+            }
+        classifier = RAGEnsembleClassifier(
+            vs, cache=cache, search_batcher=search_batcher, tail_latency=tail_latency, **clients
+        )
+        return classifier, None
+
+    pool = OllamaPool.from_file(os.environ["OLLAMA_BACKENDS"])
+    METRICS.add_collector(pool.collect)
+    classifier = RAGEnsembleClassifier(
+        vs, cache=cache, search_batcher=search_batcher, client=pool, async_client=pool.async_client,
+        scheduler=InferenceScheduler(model_concurrency=pool.capacity(DEFAULT_MODELS)), tail_latency=tail_latency,
+    )
+    return classifier, pool
+
+
+def classifier_gauges(classifier, cache, vs):
+    """/metrics rows both apps export: pre-filter, cache and index size, sampled on every scrape."""
+    pre_filter = classifier.pre_filter_stats()
+    cache_stats = cache.stats()
+    return [
+        ("prefilter_checked_total", "counter", "Reviews checked by the pre-filter", [({}, pre_filter["checked"])]),
+        ("prefilter_matched_total", "counter", "Reviews resolved by the pre-filter", [({}, pre_filter["matched"])]),
+        ("prefilter_hit_ratio", "gauge", "Share of reviews resolved by the pre-filter", [({}, pre_filter["hit_rate"])]),
+        ("prefilter_rule_hits_total", "counter", "Pre-filter hits per rule",
+         [({"label": r["label"], "rule": r["name"]}, r["hits"]) for r in pre_filter["rules"]]),
+        ("cache_hits_total", "counter", "Classification cache hits", [({}, cache_stats["hits"])]),
+        ("cache_misses_total", "counter", "Classification cache misses", [({}, cache_stats["misses"])]),
+        ("vector_index_passages", "gauge", "Passages in the live vector index", [({}, len(vs.passages))]),
+    ]
+
+
+def parse_deadline(value, max_deadline=None):
+    """
+    A request's optional "deadline" in seconds, overriding REQUEST_DEADLINE.
+
+    It may shorten REQUEST_DEADLINE but not extend it: the Ollama client times out
+    at REQUEST_DEADLINE, so a longer deadline would only turn timeouts into errors.
+
+    Args:
+        value: The request's "deadline" field (None when absent).
+        max_deadline (float, optional): The server's REQUEST_DEADLINE, if set.
+
+    Raises:
+        ValueError: When it is not a positive number or exceeds `max_deadline`, for the apps to answer 400.
+    """
+    if value is None:
+        return None
+    try:
+        deadline = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"deadline must be a number of seconds, got {value!r}") from None
+    if isinstance(value, bool) or not math.isfinite(deadline) or deadline <= 0:
+        raise ValueError(f"deadline must be a positive number of seconds, got {value!r}")
+    if max_deadline and deadline > max_deadline:
+        raise ValueError(f"deadline must be at most REQUEST_DEADLINE ({max_deadline:g}s), got {value!r}")
+    return deadline
@@ -1,23 +1,174 @@
+import csv
 import json 
-import faiss
+import hashlib
+import os
+import threading
+import time
 import numpy as np
-from sentence_transformers import SentenceTransformer
-import torch
+from src_RAG.embeddings import EMBEDDING_BACKENDS, load_embedding_model
+from src_RAG.metrics import METRICS
+# faiss, torch and sentence_transformers are imported on first use: a persisted index
+# needs no embedding model to load, and tools importing this module may never search
+
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+
+# float16 halves the persisted embeddings and the index (FAISS fp16 scalar quantizer)
+# for a recall change far below what the approximate indexes already trade away
+STORAGE_TYPES = ("float32", "float16")
+
+# Below this many passages an approximate index is no faster than exact search
+MIN_APPROX_PASSAGES = 1000
+
+# Extra search depth allowed for skipping unlabeled passages when labeled neighbours are asked for
+MAX_UNLABELED_DEPTH = 256
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+def _read_exemplars(path):
+    """
+    (texts, labels) from an exemplars file: a JSON list of {"text", "label"} like
+    assets/exemplars.json, or a CSV with a "text" column and an optional "label"
+    or "review_category" column (e.g. data/reviews_dataset.csv).
+    """
+    if path.endswith(".csv"):
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            rows = [row for row in csv.DictReader(f) if row.get("text")]
+        label_column = next((c for c in ("label", "review_category") if rows and c in rows[0]), None)
+        return [row["text"] for row in rows], [(row[label_column] or None) if label_column else None for row in rows]
+    with open(path, 'r', encoding='utf-8') as f:
+        exemplars = json.load(f)
+    return [e['text'] for e in exemplars], [e.get('label') for e in exemplars]
+
+def build_index(embeddings, index_type="flat", nlist=None, hnsw_m=32, storage="float32"):
+    """
+    FAISS inner-product index over normalised `embeddings` (cosine similarity).
+
+    "flat" is exact. "ivf" clusters the passages into `nlist` lists (default ~4*sqrt(n))
+    and searches the `nprobe` nearest; "hnsw" is a graph with `hnsw_m` links per node,
+    searched with beam width `ef_search`. Both trade recall for speed via
+    set_search_params; they fall back to flat below MIN_APPROX_PASSAGES passages.
+    `storage="float16"` keeps the vectors as half floats.
+    """
+    import faiss
+
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"index_type must be one of {INDEX_TYPES}")
+    if storage not in STORAGE_TYPES:
+        raise ValueError(f"storage must be one of {STORAGE_TYPES}")
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    n, dim = embeddings.shape
+    if index_type != "flat" and n < MIN_APPROX_PASSAGES:
+        print(f"[Info] {n} passages: using an exact flat index instead of {index_type}")
+        index_type = "flat"
+
+    fp16 = storage == "float16"
+    if index_type == "ivf":
+        nlist = nlist or max(1, min(int(4 * np.sqrt(n)), n // 39))
+        quantizer = faiss.IndexFlatIP(dim)
+        if fp16:
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+    elif index_type == "hnsw":
+        if fp16:
+            index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_fp16, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexHNSWFlat(dim, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = max(40, 2 * hnsw_m)
+    elif fp16:
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+    else:
+        index = faiss.IndexFlatIP(dim)  # Inner product for cosine similarity
+    if not index.is_trained:
+        index.train(embeddings)
+    index.add(embeddings)
+    return index
+
+def set_search_params(index, nprobe=None, ef_search=None):
+    """Recall/speed knobs of an approximate index; ignored by index types without them."""
+    if nprobe is not None and hasattr(index, "nprobe"):
+        index.nprobe = nprobe
+    if ef_search is not None and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
 
 class VectorStore: 
-    def __init__(self, policies_path, exemplars_path, embedding_model="all-MiniLM-L6-v2"):
+    """
+    Retrieval over policy passages and labeled exemplars.
+
+    Args:
+        policies_path (str): Markdown policies, split into passages by paragraph.
+        exemplars_path (str): Labeled exemplars (JSON, see _read_exemplars).
+        embedding_model (str): SentenceTransformer model name.
+        embedding_backend (str): "torch", "int8", "onnx" or "onnx-int8" (see src_RAG/embeddings.py).
+            The model is loaded on first use; call load_model() to load it up front.
+        index_dir (str): Where the index, embeddings and manifest are persisted (None disables).
+        index_type (str): "flat" (exact), "ivf" or "hnsw" (approximate, for large corpora).
+        nlist (int, optional): IVF lists; defaults to ~4*sqrt(passages).
+        nprobe (int): IVF lists searched per query; higher is slower with better recall.
+        hnsw_m (int): HNSW links per node.
+        ef_search (int): HNSW search beam width; higher is slower with better recall.
+        extra_exemplars (list[str], optional): More exemplar files (JSON or CSV), e.g.
+            tens of thousands of moderated reviews.
+        storage (str): "float16" or "float32" vectors in the index and the persisted embeddings.
+    """
+    def __init__(self, policies_path, exemplars_path, embedding_model="all-MiniLM-L6-v2", index_dir="cache/vector_index",
+                 index_type="flat", nlist=None, nprobe=16, hnsw_m=32, ef_search=64, extra_exemplars=None,
+                 embedding_backend="torch", storage="float16"):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"index_type must be one of {INDEX_TYPES}")
+        if embedding_backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"embedding_backend must be one of {EMBEDDING_BACKENDS}")
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"storage must be one of {STORAGE_TYPES}")
         self.policies_path = policies_path
         self.exemplars_path = exemplars_path
+        self.extra_exemplars = list(extra_exemplars or [])
         self.embedding_model_name = embedding_model
-        
-        device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        self.model = SentenceTransformer(embedding_model, device=device)
-        print(f"Using device: {device} for embeddings")
-        
+        self.embedding_backend = embedding_backend
+        self.storage = storage
+        self.index_dir = index_dir  # where the index, embeddings and manifest are persisted (None disables)
+        self.metrics = METRICS      # stage timings for embedding and search
+        self.index_type = index_type
+        self.nlist = nlist
+        self.hnsw_m = hnsw_m
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+
+        self._model = None  # embedding model, loaded by load_model() on first use
+        self._model_lock = threading.Lock()
+
         self.passages = []  # list of original texts
+        self.labels = []    # exemplar label per passage (None for policy passages)
         self.index = None   # FAISS index
+        self.embeddings = None  # passage embeddings (memory-mapped when loaded from disk)
+        self._unlabeled = 0     # passages without a label
+
+        # Searches, add() and reload swaps are serialised; a reload builds outside the lock
+        self._lock = threading.RLock()
+        self._added = []        # (texts, labels, embeddings) from add(), re-applied after a reload
+        self._watcher = None
+        self.reloads = 0
+        self.version = None     # changes whenever the passages do; part of the result cache key
         self._build_index()
         
+    @property
+    def model(self):
+        """The embedding model; loaded on first use."""
+        if self._model is None:
+            self.load_model()
+        return self._model
+
+    def load_model(self):
+        """Load the embedding model now, e.g. in a server's master process before it forks workers."""
+        with self._model_lock:
+            if self._model is None:
+                start = time.perf_counter()
+                self._model, device = load_embedding_model(self.embedding_model_name, self.embedding_backend)
+                print(f"Using device: {device} for embeddings ({self.embedding_backend} backend, "
+                      f"loaded in {time.perf_counter() - start:.1f}s)")
+        return self._model
+
     def _load_assets(self):
         # Load policies.md
         with open(self.policies_path, 'r', encoding='utf-8') as f:
@@ -25,44 +176,325 @@ class VectorStore:
         # Split into passages (roughly by paragraph)
         policies_passages = [p.strip() for p in policies_text.split('\n\n') if p.strip()]
 
-        # Load exemplars.json
-        with open(self.exemplars_path, 'r', encoding='utf-8') as f:
-            exemplars = json.load(f)
-        exemplars_passages = [e['text'] for e in exemplars]
-
-        # Combine
-        self.passages = policies_passages + exemplars_passages
+        # Load exemplars.json plus any extra exemplar corpora
+        passages, labels = list(policies_passages), [None] * len(policies_passages)
+        for path in [self.exemplars_path] + self.extra_exemplars:
+            texts, text_labels = _read_exemplars(path)
+            passages += texts
+            labels += text_labels
+        return passages, labels
 
     def _build_index(self):
-        self._load_assets()
+        """Load or build the index for the current assets and swap it in atomically."""
+        signature = self._asset_signature()  # taken first: a write during the build triggers another reload
+        asset_hash = self._asset_hash()
+        passages, labels = self._load_assets()
+        cpu_index, embeddings = self._load_or_build(passages, asset_hash)
+        set_search_params(cpu_index, self.nprobe, self.ef_search)
+        index = self._to_device(cpu_index)
+
+        with self._lock:
+            self.passages, self.labels = passages, labels
+            self.embeddings = embeddings
+            self.index = index
+            self._unlabeled = sum(1 for label in labels if label is None)
+            self._signature = signature
+            self.version = _sha256(f"{asset_hash}:{self.embedding_model_name}:{self.embedding_backend}".encode("utf-8"))
+            # Exemplars added at runtime survive the rebuild
+            for texts, text_labels, text_embeddings in self._added:
+                self._add_to_index(texts, text_labels, text_embeddings)
+
+    def _load_or_build(self, passages, asset_hash):
+        import faiss
+
+        manifest = self._read_manifest()
+
+        # Fast path: nothing changed since the last run, load straight from disk
+        if (manifest and manifest["asset_hash"] == asset_hash and self._same_embeddings(manifest)
+                and manifest.get("index") == self._index_config()):
+            try:
+                embeddings = np.load(self._index_file("embeddings.npy"), mmap_mode="r")
+                # IVF lists can only be memory-mapped read-only, which would rule out add()
+                flags = 0 if self.index_type == "ivf" else faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+                cpu_index = faiss.read_index(self._index_file("index.faiss"), flags)
+                print(f"Loaded persisted index ({len(passages)} passages) from {self.index_dir}")
+                return cpu_index, embeddings
+            except Exception as e:
+                print(f"[Warning] Could not load persisted index, rebuilding: {e}")
+
+        # Re-embed only passages that are new since the last manifest
+        embeddings = self._embed_passages(passages, manifest)
+        cpu_index = build_index(embeddings, self.index_type, nlist=self.nlist, hnsw_m=self.hnsw_m, storage=self.storage)
+        embeddings = embeddings.astype(self.storage, copy=False)
+        self._save_index(cpu_index, embeddings, asset_hash, passages)
+        return cpu_index, embeddings
+
+    def _index_config(self):
+        """Build-time index settings; a persisted index is only reused when they match."""
+        return {"type": self.index_type, "nlist": self.nlist, "hnsw_m": self.hnsw_m, "storage": self.storage}
+
+    def _same_embeddings(self, manifest):
+        """Whether persisted embeddings came from this model and backend (manifests before backends were torch)."""
+        return (manifest["embedding_model"] == self.embedding_model_name
+                and manifest.get("embedding_backend", "torch") == self.embedding_backend)
+
+    def _embed_passages(self, passages, manifest):
+        passage_hashes = [_sha256(p.encode("utf-8")) for p in passages]
+        reusable = {}
+        if manifest and self._same_embeddings(manifest):
+            try:
+                old_embeddings = np.load(self._index_file("embeddings.npy"), mmap_mode="r")
+                reusable = {h: old_embeddings[i] for i, h in enumerate(manifest["passage_hashes"])}
+            except Exception:
+                reusable = {}
+
+        missing = [i for i, h in enumerate(passage_hashes) if h not in reusable]
+        if reusable:
+            print(f"Re-embedding {len(missing)} of {len(passages)} changed passages")
+
+        new_embeddings = None
+        if missing:
+            new_embeddings = self.model.encode(
+                [passages[i] for i in missing], 
+                convert_to_numpy=True, 
+                normalize_embeddings=True,
+                batch_size=32,
+                show_progress_bar=True
+            ).astype(np.float32)
+        dim = new_embeddings.shape[1] if new_embeddings is not None else len(next(iter(reusable.values())))
+
+        embeddings = np.empty((len(passages), dim), dtype=np.float32)
+        for row, i in enumerate(missing):
+            embeddings[i] = new_embeddings[row]
+        for i, h in enumerate(passage_hashes):
+            if h in reusable:
+                embeddings[i] = reusable[h]
+        return embeddings
+
+    def _to_device(self, cpu_index):
+        import faiss
+
+        # FAISS has no GPU HNSW; graph indexes stay on the CPU. The CPU embedding backends
+        # are for GPU-less nodes, so their index stays there too
+        if self.embedding_backend == "torch" and faiss.get_num_gpus() > 0 and not hasattr(cpu_index, "hnsw"):
+            try:
+                res = faiss.StandardGpuResources()
+                self.gpu_index = faiss.index_cpu_to_gpu(res, 0, cpu_index)
+                return self.gpu_index
+            except Exception as e:
+                print(f"[Warning] Keeping the vector index on the CPU: {e}")
+        return cpu_index
+
+    # --- Persistence ---------------------------------------------------------
+
+    def _index_file(self, name):
+        return os.path.join(self.index_dir, name)
+
+    def _asset_paths(self):
+        return [self.policies_path, self.exemplars_path] + self.extra_exemplars
+
+    def _asset_hash(self):
+        digest = hashlib.sha256()
+        for path in self._asset_paths():
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+    def _read_manifest(self):
+        if not self.index_dir:
+            return None
+        try:
+            with open(self._index_file("manifest.json"), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_index(self, cpu_index, embeddings, asset_hash, passages):
+        if not self.index_dir:
+            return
+        os.makedirs(self.index_dir, exist_ok=True)
+        import faiss
+
+        manifest = {
+            "embedding_model": self.embedding_model_name,
+            "embedding_backend": self.embedding_backend,
+            "asset_hash": asset_hash,
+            "passage_hashes": [_sha256(p.encode("utf-8")) for p in passages],
+            "dim": int(embeddings.shape[1]),
+            "index": self._index_config(),
+        }
+        # Write to temp files then rename, so a crash never leaves a half-written index behind.
+        # The manifest goes last: it is what marks the other files as valid. Temp names are
+        # per process, since every server worker rebuilds on its own after an asset change
+        suffix = f".{os.getpid()}.tmp"
+        with open(self._index_file("embeddings.npy" + suffix), 'wb') as f:
+            np.save(f, embeddings)
+        faiss.write_index(cpu_index, self._index_file("index.faiss" + suffix))
+        with open(self._index_file("manifest.json" + suffix), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(self._index_file("embeddings.npy" + suffix), self._index_file("embeddings.npy"))
+        os.replace(self._index_file("index.faiss" + suffix), self._index_file("index.faiss"))
+        os.replace(self._index_file("manifest.json" + suffix), self._index_file("manifest.json"))
+
+    # --- Live updates --------------------------------------------------------
+
+    def add(self, texts, labels=None):
+        """
+        Embed and add exemplars (or unlabeled context passages) to the live index.
+
+        Only the new texts are embedded; an IVF index keeps its trained lists. Added
+        exemplars are kept across hot reloads but not persisted: add them to an
+        exemplars file to keep them across restarts.
+
+        Returns:
+            int: Passages in the index afterwards.
+        """
+        texts = list(texts)
+        labels = list(labels) if labels is not None else [None] * len(texts)
+        if len(labels) != len(texts):
+            raise ValueError("labels must match texts one to one")
+        if not texts:
+            return len(self.passages)
         embeddings = self.model.encode(
-            self.passages, 
-            convert_to_numpy=True, 
+            texts,
+            convert_to_numpy=True,
             normalize_embeddings=True,
             batch_size=32,
-            show_progress_bar=True
-        )
-        dim = embeddings.shape[1]
-        
-        if torch.cuda.is_available():
-            res = faiss.StandardGpuResources()
-            self.index = faiss.IndexFlatIP(dim)
-            self.gpu_index = faiss.index_cpu_to_gpu(res, 0, self.index)
-            self.gpu_index.add(embeddings)
-            self.index = self.gpu_index
-        else:
-            self.index = faiss.IndexFlatIP(dim)  # Inner product for cosine similarity
-            self.index.add(embeddings)
+            show_progress_bar=False
+        ).astype(np.float32)
+        with self._lock:
+            self._add_to_index(texts, labels, embeddings)
+            self._added.append((texts, labels, embeddings))
+            return len(self.passages)
+
+    def _add_to_index(self, texts, labels, embeddings):
+        # New lists rather than in-place appends, so callers holding the old ones stay consistent
+        self.passages = self.passages + texts
+        self.labels = self.labels + labels
+        self.embeddings = np.vstack([self.embeddings, embeddings.astype(self.storage)])
+        self._unlabeled += sum(1 for label in labels if label is None)
+        # Chained over the added texts, so every worker given the same exemplars agrees on it
+        self.version = _sha256(json.dumps([self.version, texts, labels], ensure_ascii=False).encode("utf-8"))
+        self.index.add(np.ascontiguousarray(embeddings, dtype=np.float32))
+
+    def set_search_params(self, nprobe=None, ef_search=None):
+        """Retune recall vs latency of the live approximate index (IVF nprobe, HNSW efSearch)."""
+        with self._lock:
+            self.nprobe = nprobe if nprobe is not None else self.nprobe
+            self.ef_search = ef_search if ef_search is not None else self.ef_search
+            set_search_params(self.index, self.nprobe, self.ef_search)
+
+    def reload(self):
+        """
+        Rebuild from the asset files and swap the new index in atomically.
+
+        Searches keep using the current index while the new one is built; only
+        changed passages are re-embedded.
+        """
+        start = time.perf_counter()
+        self._build_index()
+        self.reloads += 1
+        self.metrics.inc("vector_index_reloads_total")
+        print(f"Reloaded vector index ({len(self.passages)} passages) in {time.perf_counter() - start:.2f}s")
+
+    def watch(self, interval=5.0):
+        """Hot-reload in a background thread whenever an asset file changes (polled every `interval` seconds)."""
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, args=(interval,), name="vector-store-watch", daemon=True)
+            self._watcher.start()
+
+    def _asset_signature(self):
+        signature = []
+        for path in self._asset_paths():
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((path, None, None))
+        return signature
+
+    def _watch(self, interval):
+        while True:
+            time.sleep(interval)
+            current = self._asset_signature()
+            if current == self._signature:
+                continue
+            # Let an in-progress write settle before reading the files
+            time.sleep(min(interval, 1.0))
+            if self._asset_signature() != current:
+                continue
+            try:
+                self.reload()
+            except Exception as e:
+                # Don't retry the same broken files; the next change triggers another attempt
+                self._signature = current
+                print(f"[Warning] Vector index reload failed, keeping the current index: {e}")
 
     def query(self, review_text, top_k=3):
-        # Embed the review
-        review_emb = self.model.encode([review_text], convert_to_numpy=True, normalize_embeddings=True)
-        # Search
-        distances, indices = self.index.search(review_emb, top_k)
-        # Return top-k passages
-        results = [self.passages[i] for i in indices[0]]
+        return self.query_batch([review_text], top_k=top_k)[0]
+
+    def query_batch(self, review_texts, top_k=3, batch_size=64):
+        """
+        Retrieve top-k passages for many reviews at once.
+
+        Encodes all reviews in batches of `batch_size` and runs a single FAISS
+        search over the whole query matrix, instead of one encode + search per review.
+
+        Returns:
+            list[list[str]]: Top-k passages for each review, in input order.
+        """
+        return [passages for passages, _ in self.search_batch(review_texts, top_k=top_k, batch_size=batch_size)]
+
+    def search_batch(self, review_texts, top_k=3, labeled_k=0, batch_size=64, timings=None):
+        """
+        Batched search returning both retrieval context and labeled neighbours.
+
+        Args:
+            review_texts (list[str]): Reviews to search for.
+            top_k (int): Passages of context to return per review.
+            labeled_k (int): Nearest labeled exemplars to return per review.
+            batch_size (int): Encoding batch size.
+            timings (dict, optional): Per-request breakdown to add stage times to.
+
+        Returns:
+            list[tuple]: Per review, (top-k passages, [{"text", "label", "score"}, ...]
+                         for the nearest `labeled_k` labeled exemplars, best first).
+        """
+        if not review_texts:
+            return []
+        # Embed the reviews
+        with self.metrics.stage("embedding", timings):
+            review_embs = self.model.encode(
+                list(review_texts),
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                batch_size=batch_size,
+                show_progress_bar=False
+            )
+
+        # One consistent view of the index and its passages, even across a reload swap
+        with self._lock:
+            all_passages, all_labels = self.passages, self.labels
+            # Search deep enough that `labeled_k` labeled hits survive skipping unlabeled passages
+            k = top_k
+            if labeled_k:
+                k = max(top_k, labeled_k + min(self._unlabeled, MAX_UNLABELED_DEPTH))
+            k = min(k, len(all_passages))
+            with self.metrics.stage("faiss_search", timings):
+                scores, indices = self.index.search(review_embs, k)
+
+        # FAISS pads with -1 when k > ntotal
+        results = []
+        for row_scores, row in zip(scores, indices):
+            hits = [(i, float(score)) for i, score in zip(row, row_scores) if i >= 0]
+            passages = [all_passages[i] for i, _ in hits[:top_k]]
+            neighbours = [
+                {"text": all_passages[i], "label": all_labels[i], "score": score}
+                for i, score in hits if all_labels[i] is not None
+            ][:labeled_k]
+            results.append((passages, neighbours))
         return results
-    
+
 if __name__ == "__main__":
     # Quick test
     vs = VectorStore("assets/policies.md", "assets/exemplars.json")
@@ -1,5 +1,6 @@
 import sys
 import os
+import argparse
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import time 
 from metadata import shop_info
@@ -7,8 +8,27 @@ from metadata import shop_info
 import pandas as pd 
 from src_RAG.rag_classifier import RAGEnsembleClassifier
 from src_RAG.vector_store import VectorStore
+from src_RAG.prefilter import PreFilter
+from src_TestSet.recorder import OutputStore, RecordingClient
 from sklearn.metrics import accuracy_score, precision_recall_fscore_support
 
+parser = argparse.ArgumentParser(description="Evaluate the RAG ensemble on data/reviews_dataset.csv")
+parser.add_argument("--knn-threshold", type=float, default=None,
+                    help="Enable the kNN fast path at this cosine similarity")
+parser.add_argument("--knn-k", type=int, default=3,
+                    help="Labeled neighbours consulted by the kNN fast path")
+parser.add_argument("--knn-sweep", type=float, nargs="+", default=None,
+                    help="Report the accuracy/latency trade-off of the kNN fast path at these thresholds")
+parser.add_argument("--record", action="store_true",
+                    help="Record every model output for src_TestSet/replay.py; prompts already recorded are not re-run")
+parser.add_argument("--record-store", default="cache/eval_outputs.sqlite",
+                    help="SQLite file the model outputs are recorded to")
+args = parser.parse_args()
+if args.knn_sweep and args.knn_threshold is not None:
+    parser.error("--knn-sweep needs the ensemble's own predictions; run it without --knn-threshold")
+if args.record and args.knn_threshold is not None:
+    parser.error("--record sends every review to the models; score the kNN fast path with --knn-sweep instead")
+
 df = pd.read_csv("data/reviews_dataset.csv")
 
 # Get a random sample of n reviews for evaluation
@@ -20,22 +40,34 @@ true_labels = df["review_category"].tolist()
 
 # Set Up Vector database 
 vs = VectorStore("assets/policies.md", "assets/exemplars.json")
-classifier = RAGEnsembleClassifier(vs)
+recorder = RecordingClient(OutputStore(args.record_store)) if args.record else None
+if args.record:
+    # Every review goes to every model, so replay.py can try any pre-filter, kNN threshold
+    # or dedup setting from the store; the pre-filter is applied when scoring instead
+    classifier = RAGEnsembleClassifier(vs, client=recorder, pre_filter_rules=PreFilter({}), dedup=False)
+    pre_filter = PreFilter.from_file()
+else:
+    classifier = RAGEnsembleClassifier(vs, knn_threshold=args.knn_threshold, knn_k=args.knn_k, client=recorder)
+    pre_filter = classifier.pre_filter_engine
 
 # --- Measure Inference Time ---
 start_time = time.time()
 
 ## Run Inference, Use classify_batch for multiple inferences ( Without any Shop metadata )
-predicted_results = classifier.classify_batch(texts, show_rationale=False, sleep=0.1)
+predicted_results, dedup_stats = classifier.classify_batch(texts, show_rationale=False, sleep=0.1, return_stats=True)
 
 # Run Inference, Use Classify_batch for mulitple inferences ( With Shop metadata Dictionary )
-# predicted_results = classifier.classify_batch(reviews, shop_info=shop_info, show_rationale=False, sleep=0.1 )
+# predicted_results, dedup_stats = classifier.classify_batch(reviews, shop_info=shop_info, show_rationale=False, sleep=0.1, return_stats=True)
 
 # --- Measure Inference Time --- 
 end_time = time.time() 
 total_time = end_time - start_time
 avg_time_per_sample = total_time / len(texts) 
 
+if args.record:
+    pre_labels = pre_filter.match_batch(texts)
+    predicted_results = [{"label": pre_label} if pre_label else result for pre_label, result in zip(pre_labels, predicted_results)]
+
 # Extract predicted labels
 predicted_labels = [result["label"] for result in predicted_results]
 
@@ -80,5 +112,44 @@ for i, label in enumerate(labels_to_evaluate):
 print(f"\n--- Inference Timing ---")
 print(f"Total time taken: {total_time:.4f} seconds")
 print(f"Average time per review: {avg_time_per_sample:.4f} seconds")
-
-# Batch Classification takes in the Review and store name 
\ No newline at end of file
+print(f"Unique reviews classified: {dedup_stats['unique']} of {dedup_stats['total']} ({dedup_stats['duplicates']} duplicates collapsed)")
+if recorder:
+    record_stats = recorder.stats()
+    print(f"Model outputs: {record_stats['inferred']} inferred, {record_stats['replayed']} replayed from {args.record_store}")
+
+# --- Pre-filter Coverage ---
+pre_filter_stats = pre_filter.stats()
+print(f"\n--- Pre-filter Coverage ---")
+print(f"Matched {pre_filter_stats['matched']} of {pre_filter_stats['checked']} reviews ({pre_filter_stats['hit_rate']:.2%}), "
+      f"saving {pre_filter_stats['matched'] * len(classifier.model)} LLM calls")
+for rule in pre_filter_stats["rules"]:
+    print(f"  {rule['label']:<20} {rule['name']:<20} {rule['hits']}")
+
+# Batch Classification takes in the Review and store name 
+
+# --- kNN Fast Path Trade-off ---
+# Replays the ensemble predictions above, substituting the kNN label wherever the
+# fast path would have fired, so every threshold is scored without re-running the LLMs
+if args.knn_sweep:
+    search_start = time.time()
+    searches = vs.search_batch(texts, top_k=classifier.top_k, labeled_k=args.knn_k)
+    search_time = time.time() - search_start
+
+    pre_filtered = [label is not None for label in pre_filter.match_batch(texts)]
+    llm_reviews = sum(1 for p in pre_filtered if not p) or 1
+
+    print(f"\n--- kNN Fast Path Trade-off (k={args.knn_k}) ---")
+    print(f"{'Threshold':<12} {'Fast hits':<12} {'Fast acc':<12} {'Accuracy':<12} {'Est. s/review':<15}")
+    print("-" * 63)
+    for threshold in sorted(args.knn_sweep):
+        knn_predictions = [
+            None if pre_filtered[i] else classifier.knn_label(neighbours, threshold)
+            for i, (_, neighbours) in enumerate(searches)
+        ]
+        combined = [knn or predicted for knn, predicted in zip(knn_predictions, predicted_labels)]
+        fast = [i for i, knn in enumerate(knn_predictions) if knn]
+        fast_accuracy = accuracy_score([true_labels[i] for i in fast], [combined[i] for i in fast]) if fast else float("nan")
+        threshold_accuracy = accuracy_score(true_labels, combined)
+        # LLM time scales with the reviews still sent to the ensemble
+        est_total = total_time * (llm_reviews - len(fast)) / llm_reviews + search_time
+        print(f"{threshold:<12.3f} {len(fast):<12} {fast_accuracy:<12.4f} {threshold_accuracy:<12.4f} {est_total / len(texts):<15.4f}")
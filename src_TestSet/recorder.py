@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def prompt_hash(messages, options=None, format=None, think=None):
+    """Hash of everything that determines a model's answer, apart from the model name."""
+    payload = json.dumps(
+        {"messages": messages, "options": options or {}, "format": format, "think": think},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class OutputStore:
+    """SQLite store of raw model outputs keyed by (prompt hash, model)."""
+
+    def __init__(self, path="cache/eval_outputs.sqlite"):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outputs ("
+            "prompt_hash TEXT NOT NULL, model TEXT NOT NULL, output TEXT NOT NULL, "
+            "latency REAL, created REAL NOT NULL, PRIMARY KEY (prompt_hash, model))"
+        )
+        self._db.commit()
+
+    def get(self, key, model):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT output FROM outputs WHERE prompt_hash = ? AND model = ?", (key, model)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, key, model, output, latency=None):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO outputs (prompt_hash, model, output, latency, created) VALUES (?, ?, ?, ?, ?)",
+                (key, model, output, latency, time.time()),
+            )
+            self._db.commit()
+
+    def models(self):
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT DISTINCT model FROM outputs ORDER BY model")]
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outputs").fetchone()[0]
+
+
+class RecordingClient:
+    """
+    Wraps an Ollama client (anything with ollama.chat's signature) with an OutputStore.
+
+    Every answer is recorded under its prompt hash and model; a prompt that was
+    already recorded is answered from the store without inference, so only
+    changed prompts reach the models. With `offline=True` nothing ever reaches
+    the models: unrecorded prompts get an empty answer (parsed as 'unknown')
+    and are counted in `missing`.
+    """
+
+    def __init__(self, store, client=None, offline=False):
+        if client is None:
+            import ollama
+            client = ollama
+        self.store = store
+        self.client = client
+        self.offline = offline
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.missing = 0
+
+    def chat(self, model="", messages=None, **kwargs):
+        key = prompt_hash(messages, kwargs.get("options"), kwargs.get("format"), kwargs.get("think"))
+        output = self.store.get(key, model)
+        if output is not None:
+            with self._lock:
+                self.hits += 1
+            return {"message": {"role": "assistant", "content": output}}
+
+        if self.offline:
+            with self._lock:
+                self.missing += 1
+            return {"message": {"role": "assistant", "content": ""}}
+
+        start = time.perf_counter()
+        response = self.client.chat(model=model, messages=messages, **kwargs)
+        output = response.get("message", {}).get("content", "")
+        self.store.put(key, model, output, time.perf_counter() - start)
+        with self._lock:
+            self.misses += 1
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {"replayed": self.hits, "inferred": self.misses, "missing": self.missing}
@@ -0,0 +1,119 @@
+"""
+Replay ensemble experiments from recorded model outputs, with no inference.
+
+Record once with `python -m src_TestSet.evaluate --record`, then try model
+subsets, voting rules and pre-filter rule files in seconds:
+
+    python -m src_TestSet.replay
+    python -m src_TestSet.replay --models llama2:7b gemma3:4b --voting majority weighted \
+        --weights llama2:7b=1.5 gemma3:4b=1 --prefilter-rules my_rules.json
+
+Prompts that were never recorded (e.g. after a prompt change) are reported as
+missing; re-run evaluate.py with --record to fill them in.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import time
+from collections import Counter
+
+import pandas as pd
+from sklearn.metrics import accuracy_score
+
+from src_RAG.prefilter import PreFilter
+from src_RAG.prompt import PromptBuilder
+from src_RAG.rag_classifier import RAGEnsembleClassifier, labels
+from src_RAG.vector_store import VectorStore
+from src_TestSet.recorder import OutputStore, RecordingClient
+
+
+def vote_majority(outputs, weights):
+    """The classifier's own rule: most common label, ties go to the earlier model."""
+    return Counter(o["label"] for o in outputs).most_common(1)[0][0]
+
+
+def vote_majority_known(outputs, weights):
+    """Majority over models that produced a real label; 'unknown' only if all did."""
+    known = [o["label"] for o in outputs if o["label"] != "unknown"]
+    return Counter(known).most_common(1)[0][0] if known else "unknown"
+
+
+def vote_weighted(outputs, weights):
+    """Sum of per-model weights per label (default weight 1)."""
+    scores = Counter()
+    for o in outputs:
+        scores[o["label"]] += weights.get(o["model"], 1.0)
+    return scores.most_common(1)[0][0]
+
+
+VOTING = {
+    "majority": vote_majority,
+    "majority_known": vote_majority_known,
+    "weighted": vote_weighted,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay ensemble configurations from recorded model outputs")
+    parser.add_argument("--data", default="data/reviews_dataset.csv")
+    parser.add_argument("--store", default="cache/eval_outputs.sqlite")
+    parser.add_argument("--models", nargs="+", default=None, help="Ensemble members (default: the classifier's)")
+    parser.add_argument("--voting", nargs="+", default=["majority"], choices=sorted(VOTING))
+    parser.add_argument("--weights", nargs="*", default=[], help="model=weight pairs for weighted voting")
+    parser.add_argument("--prefilter-rules", default=None, help="Pre-filter rules JSON (default: assets/prefilter_rules.json)")
+    parser.add_argument("--no-prefilter", action="store_true", help="Send every review to the ensemble")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.store):
+        parser.error(f"No recorded outputs at {args.store}; run evaluate.py with --record first")
+    weights = {m: float(w) for m, w in (pair.split("=", 1) for pair in args.weights)}
+
+    df = pd.read_csv(args.data)
+    texts = df["text"].tolist()
+    true_labels = df["review_category"].tolist()
+
+    start = time.time()
+    vs = VectorStore("assets/policies.md", "assets/exemplars.json")
+    store = OutputStore(args.store)
+    client = RecordingClient(store, offline=True)
+    classifier = RAGEnsembleClassifier(
+        vs,
+        models=args.models,
+        client=client,
+        pre_filter_rules=PreFilter({}) if args.no_prefilter else args.prefilter_rules,
+        dedup=False,
+    )
+    # The prompt budget reserves room for the largest answer cap in the ensemble; size it
+    # for every recorded model so a subset builds the same prompts that were recorded
+    recorded = set(store.models()) | set(classifier.model)
+    classifier.prompt_builder = PromptBuilder(
+        labels, num_ctx=classifier.num_ctx, reserve_tokens=max(classifier._num_predict(m) for m in recorded)
+    )
+    results = classifier.classify_batch(texts, show_rationale=True)
+    elapsed = time.time() - start
+
+    print(f"\n--- Replay ({len(texts)} reviews, models: {', '.join(classifier.model)}) ---")
+    stats = client.stats()
+    print(f"Replayed {stats['replayed']} model outputs, {stats['missing']} missing, in {elapsed:.2f} seconds")
+    if stats["missing"]:
+        print("[Warning] Missing outputs count as 'unknown'; re-run evaluate.py --record for the changed prompts")
+
+    print(f"\n{'Voting':<20} {'Accuracy':<12} {'Unknown':<10}")
+    print("-" * 42)
+    for name in args.voting:
+        predicted = []
+        for result in results:
+            outputs = [o for o in result.get("model_outputs", []) if o.get("label") is not None]
+            if result.get("label") == "error" or not outputs:
+                predicted.append(result.get("label", "error"))
+            elif outputs[0].get("rationale") == "Detected by pre-filter":
+                predicted.append(result["label"])
+            else:
+                predicted.append(VOTING[name](outputs, weights))
+        unknown = sum(1 for p in predicted if p == "unknown")
+        print(f"{name:<20} {accuracy_score(true_labels, predicted):<12.4f} {unknown:<10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from src_RAG.rag_classifier import RAGEnsembleClassifier
+from src_RAG.scheduler import InferenceScheduler
+from src_Benchmark.mock_ollama import MockOllama, AsyncMockOllama
+
+MODELS = ["llama2:7b", "deepseek-r1:7b", "gemma3:4b"]
+
+
+class FakeVectorStore:
+    """Stands in for VectorStore: fixed context, no embedding model or FAISS."""
+
+    def __init__(self):
+        self.version = "v1"
+        self.searched = []  # review texts, in search order
+
+    def search_batch(self, review_texts, top_k=3, labeled_k=0, batch_size=64, timings=None):
+        self.searched.extend(review_texts)
+        return [(["Reviews must describe a real visit."], []) for _ in review_texts]
+
+
+def fixed_latency(seconds=0.0, overrides=None):
+    """MockOllama latency config: `seconds` per call for every model, or {model: seconds} overrides."""
+    overrides = overrides or {}
+    return {m: {"dist": "fixed", "value": overrides.get(m, seconds)} for m in MODELS}
+
+
+@pytest.fixture
+def vector_store():
+    return FakeVectorStore()
+
+
+@pytest.fixture
+def make_classifier(vector_store):
+    """RAGEnsembleClassifier over the fake store and a MockOllama, with its own scheduler."""
+    def make(mock=None, async_mock=None, **kwargs):
+        kwargs.setdefault("scheduler", InferenceScheduler(concurrency=4))
+        return RAGEnsembleClassifier(
+            vector_store,
+            models=list(MODELS),
+            client=mock or MockOllama(latency=fixed_latency(), agreement=1.0),
+            async_client=async_mock or AsyncMockOllama(latency=fixed_latency(), agreement=1.0),
+            **kwargs,
+        )
+    return make
@@ -0,0 +1,71 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import socket
+
+import pytest
+
+from src_RAG.backends import BackendUnavailable, OllamaPool
+from src_Benchmark.mock_ollama import MockOllama
+from src_Benchmark.mock_ollama_server import MockOllamaServer
+
+
+def test_capacity_counts_wildcard_hosts_for_every_model():
+    pool = OllamaPool(
+        [{"url": "http://a", "models": ["m1"], "max_in_flight": 2}, {"url": "http://b", "max_in_flight": 3}],
+        health_interval=0,
+    )
+    assert pool.capacity(["m1", "m2"]) == {"m1": 5, "m2": 3}
+
+
+def test_capacity_of_wildcard_hosts_needs_the_models():
+    pool = OllamaPool([{"url": "http://a", "max_in_flight": 3}], health_interval=0)
+    with pytest.raises(ValueError):
+        pool.capacity()
+
+
+def _dead_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+
+def test_load_succeeds_with_a_host_down_and_counts_it_against_the_host():
+    live = MockOllamaServer(models=["m"]).start()
+    try:
+        pool = OllamaPool(
+            [{"url": live.url, "models": ["m"]}, {"url": _dead_url(), "models": ["m"]}],
+            max_failures=2, health_interval=0,
+        )
+        for _ in range(2):
+            pool.chat(model="m", messages=[])
+        healthy = {s["url"]: s["healthy"] for s in pool.stats()}
+        assert healthy[live.url] and list(healthy.values()).count(False) == 1
+        assert all(s["in_flight"] == 0 for s in pool.stats())
+    finally:
+        live.stop()
+
+
+def test_load_fails_when_no_host_loads_the_model():
+    pool = OllamaPool([{"url": _dead_url(), "models": ["m"]}], health_interval=0)
+    with pytest.raises(BackendUnavailable):
+        pool.chat(model="m", messages=[])
+
+
+def test_cancelled_calls_give_back_their_host_slot():
+    live = MockOllamaServer(models=["m"], backend=MockOllama(latency={"m": {"dist": "fixed", "value": 1.0}})).start()
+    try:
+        pool = OllamaPool([{"url": live.url, "models": ["m"], "max_in_flight": 4}], health_interval=0)
+
+        async def timed_out():
+            calls = [pool.achat(model="m", messages=[{"role": "user", "content": "hi"}]) for _ in range(3)]
+            await asyncio.wait_for(asyncio.gather(*calls), timeout=0.1)
+
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(timed_out())
+        assert [s["in_flight"] for s in pool.stats()] == [0]
+        assert [s["healthy"] for s in pool.stats()] == [True]
+    finally:
+        live.stop()
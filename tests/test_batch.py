@@ -0,0 +1,28 @@
+import asyncio
+
+from src_RAG.cache import ClassificationCache
+from src_Benchmark.mock_ollama import MockOllama
+from conftest import fixed_latency
+
+REVIEWS = [f"The pasta number {i} was great" for i in range(5)] + ["Visit www.pasta-deals.com now"]
+
+
+def test_cached_batch_reviews_skip_retrieval(make_classifier, vector_store):
+    mock = MockOllama(latency=fixed_latency(), agreement=1.0)
+    classifier = make_classifier(mock, cache=ClassificationCache(), dedup=False)
+    first = classifier.classify_batch(REVIEWS)
+    assert len(vector_store.searched) == 5  # the pre-filter answers the advertisement
+
+    vector_store.searched.clear()
+    calls = mock.total_calls()
+    assert classifier.classify_batch(REVIEWS) == first
+    assert vector_store.searched == [] and mock.total_calls() == calls
+    assert classifier.cache.stats()["misses"] == 5
+
+
+def test_cached_async_batch_reviews_skip_retrieval(make_classifier, vector_store):
+    classifier = make_classifier(cache=ClassificationCache(), dedup=False)
+    first = asyncio.run(classifier.aclassify_batch(REVIEWS))
+    vector_store.searched.clear()
+    assert asyncio.run(classifier.aclassify_batch(REVIEWS)) == first
+    assert vector_store.searched == []
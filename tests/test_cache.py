@@ -0,0 +1,18 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src_RAG.cache import ClassificationCache, make_key
+
+
+def test_index_version_is_part_of_the_key():
+    key = make_key("Great  coffee", None, ["llama2:7b"], 3, "v1", index_version="a")
+    assert key == make_key("great coffee", None, ["llama2:7b"], 3, "v1", index_version="a")
+    assert key != make_key("great coffee", None, ["llama2:7b"], 3, "v1", index_version="b")
+
+
+def test_reloaded_index_misses_old_rows():
+    cache = ClassificationCache()
+    cache.put(make_key("great coffee", None, ["m"], 3, "v1", index_version="a"), {"label": "Valid"})
+    assert cache.get(make_key("great coffee", None, ["m"], 3, "v1", index_version="b")) is None
+    assert cache.get(make_key("great coffee", None, ["m"], 3, "v1", index_version="a")) == {"label": "Valid"}
@@ -0,0 +1,61 @@
+import asyncio
+
+from src_RAG.dedup import ReviewDeduplicator
+from src_Benchmark.mock_ollama import MockOllama
+from conftest import fixed_latency
+
+TEMPLATE = "Best burgers in town, use code SAVE10 at www.burger-deals.com/{} for a free shake"
+
+
+def test_exact_duplicates_group_after_normalisation():
+    texts = ["Great food!", "great   FOOD", "Terrible service.", "Great food"]
+    assert ReviewDeduplicator().group(texts) == [[0, 1, 3], [2]]
+
+
+def test_urls_are_masked_so_templated_spam_collapses():
+    texts = [TEMPLATE.format(i) for i in range(4)]
+    assert ReviewDeduplicator().group(texts) == [[0, 1, 2, 3]]
+
+
+def test_near_duplicates_need_a_threshold():
+    texts = [
+        "The waiter was rude and the soup arrived cold, never coming back here again",
+        "The waiter was rude and the soup arrived cold, never coming back here again!!! Avoid",
+        "Lovely quiet cafe with excellent espresso and friendly baristas",
+    ]
+    assert ReviewDeduplicator().group(texts) == [[0], [1], [2]]
+    assert ReviewDeduplicator(threshold=0.7).group(texts) == [[0, 1], [2]]
+
+
+def test_different_keys_are_never_grouped():
+    assert ReviewDeduplicator().group(["Great food"] * 3, keys=["a", "b", "a"]) == [[0, 2], [1]]
+
+
+def test_summarize():
+    stats = ReviewDeduplicator.summarize([[0, 1, 3], [2]], 4)
+    assert stats == {"total": 4, "unique": 2, "duplicates": 2, "largest_group": 3, "savings": 0.5}
+
+
+def test_batch_classifies_each_group_once_and_copies_back(make_classifier, vector_store):
+    mock = MockOllama(latency=fixed_latency(), agreement=1.0)
+    classifier = make_classifier(mock)
+    reviews = ["Great food!", "Terrible service.", "great FOOD", "Great food"]
+    results, stats = classifier.classify_batch(reviews, return_stats=True)
+
+    assert stats["unique"] == 2 and stats["duplicates"] == 2
+    assert mock.total_calls() == 3 * 2 and len(vector_store.searched) == 2
+    assert "duplicate_of" not in results[0] and "duplicate_of" not in results[1]
+    for i in (2, 3):
+        assert results[i] == {**results[0], "duplicate_of": 0}
+
+    async_results = asyncio.run(classifier.aclassify_batch(reviews))
+    assert [r.get("duplicate_of") for r in async_results] == [None, None, 0, 0]
+
+
+def test_shop_metadata_keeps_duplicates_apart(make_classifier):
+    mock = MockOllama(latency=fixed_latency(), agreement=1.0)
+    classifier = make_classifier(mock)
+    shop_info = {"A": {"Name": "Pizza A"}, "B": {"Name": "Pizza B"}}
+    results = classifier.classify_batch([("Great food", "A"), ("Great food", "B"), ("Great food", "A")], shop_info=shop_info)
+    assert [r.get("duplicate_of") for r in results] == [None, None, 0]
+    assert mock.total_calls() == 3 * 2
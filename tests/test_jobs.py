@@ -0,0 +1,71 @@
+import json
+import os
+import time
+
+import pytest
+
+from src_RAG.jobs import JobManager, COMPLETED, RUNNING
+from src_Benchmark.mock_ollama import MockOllama
+from conftest import fixed_latency
+
+REVIEWS = [f"Review {i}: the risotto was lovely" for i in range(6)]
+
+
+def _wait(jobs, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = jobs.status(job_id)
+        if status["status"] not in ("queued", RUNNING):
+            return status
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def _checkpoint_lines(root, job_id):
+    with open(os.path.join(root, job_id, "results.jsonl"), 'rb') as f:
+        return f.read().split(b"\n")
+
+
+def test_job_runs_and_checkpoints_every_review(make_classifier, tmp_path):
+    jobs = JobManager(make_classifier(), root=str(tmp_path))
+    job_id = jobs.submit(REVIEWS)
+    status = _wait(jobs, job_id)
+    assert status["status"] == COMPLETED and status["completed"] == len(REVIEWS)
+    page = jobs.results(job_id)
+    assert [item["index"] for item in page["items"]] == list(range(len(REVIEWS)))
+    assert len([line for line in _checkpoint_lines(str(tmp_path), job_id) if line]) == len(REVIEWS)
+
+
+def test_interrupted_job_resumes_with_only_the_missing_reviews(make_classifier, tmp_path):
+    # A job a previous process left running, with two results and a torn third line
+    job_id = "a" * 32
+    job_dir = tmp_path / job_id
+    job_dir.mkdir()
+    (job_dir / "input.json").write_text(json.dumps({"reviews": REVIEWS, "shop_info": None, "show_rationale": False}))
+    (job_dir / "status.json").write_text(json.dumps({
+        "id": job_id, "status": RUNNING, "total": len(REVIEWS), "completed": 2, "errors": 0,
+        "created": time.time(), "started": time.time(), "finished": None, "error": None,
+    }))
+    checkpointed = [json.dumps({"index": i, "result": {"label": "Checkpointed"}}) for i in (0, 3)]
+    (job_dir / "results.jsonl").write_text("\n".join(checkpointed) + '\n{"index": 1, "resu')
+
+    mock = MockOllama(latency=fixed_latency(), agreement=1.0)
+    jobs = JobManager(make_classifier(mock), root=str(tmp_path))
+    status = _wait(jobs, job_id)
+
+    assert status["status"] == COMPLETED and status["completed"] == len(REVIEWS)
+    assert mock.total_calls() == 3 * (len(REVIEWS) - 2)
+    results = {item["index"]: item["result"] for item in jobs.results(job_id)["items"]}
+    assert sorted(results) == list(range(len(REVIEWS)))
+    assert results[0]["label"] == results[3]["label"] == "Checkpointed"
+    assert results[1]["label"] != "Checkpointed"
+    # The torn line was dropped rather than glued to the next result
+    lines = [line for line in _checkpoint_lines(str(tmp_path), job_id) if line]
+    assert len(lines) == len(REVIEWS) and all(json.loads(line) for line in lines)
+
+
+def test_malformed_job_is_rejected_at_submission(make_classifier, tmp_path):
+    jobs = JobManager(make_classifier(), root=str(tmp_path))
+    with pytest.raises(ValueError):
+        jobs.submit([1, 2])
+    assert jobs.list_jobs() == []
@@ -0,0 +1,45 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src_RAG.prefilter import PreFilter
+
+
+def _parity(pre_filter, texts):
+    single = [pre_filter.match(t) for t in texts]
+    assert pre_filter.match_batch(texts) == single
+    return single
+
+
+def test_anchored_rules_match_every_review_in_a_batch():
+    pre_filter = PreFilter({
+        "Advertisement": [{"name": "visit_prefix", "pattern": "^visit ", "regex": True}],
+        "Irrelevant Content": [{"name": "question", "pattern": "\\?$", "regex": True}],
+    })
+    texts = ["visit our store", "visit us today", "is this open?", "why so slow?"]
+    assert _parity(pre_filter, texts) == ["Advertisement", "Advertisement", "Irrelevant Content", "Irrelevant Content"]
+
+
+def test_first_listed_rule_wins_on_overlapping_matches():
+    pre_filter = PreFilter({
+        "Advertisement": [{"name": "code", "pattern": "code"}],
+        "Rant Without Visit": [{"name": "use_co", "pattern": "use co"}],
+    })
+    assert _parity(pre_filter, ["please use code", "great food", "use coupons"]) == [
+        "Advertisement", None, "Rant Without Visit"
+    ]
+    hits = {rule["name"]: rule["hits"] for rule in pre_filter.stats()["rules"]}
+    assert hits["code"] == 2
+
+
+def test_regex_never_spans_two_reviews():
+    pre_filter = PreFilter({"Advertisement": [{"name": "promo", "pattern": "buy.*now", "regex": True}]})
+    assert _parity(pre_filter, ["buy", "now", "buy it now"]) == [None, None, "Advertisement"]
+
+
+def test_default_rules_parity():
+    pre_filter = PreFilter.from_file()
+    texts = ["Visit www.deals.com", "I have never been here", "Lovely pasta", "", "use code SAVE10"]
+    assert _parity(pre_filter, texts) == [
+        "Advertisement", "Rant Without Visit", None, None, "Advertisement"
+    ]
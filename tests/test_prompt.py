@@ -0,0 +1,32 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src_RAG.prompt import PromptBuilder
+
+
+def _review_part(messages):
+    return messages[1]["content"].split("Review text to classify:\n", 1)[1]
+
+
+def test_truncation_keeps_as_much_of_the_review_as_fits():
+    builder = PromptBuilder(["Valid"], num_ctx=200, reserve_tokens=0)
+    messages, info = builder.build(" ".join(["incomprehensibilities"] * 300))
+    assert info["review_truncated"]
+    assert builder.budget - 6 < info["prompt_tokens"] <= builder.budget
+    assert _review_part(messages).startswith("incomprehensibilities incomprehensibilities")
+
+
+def test_truncation_cuts_the_original_text():
+    review = "I don't think they've ever been open, honestly. " * 20
+    messages, info = PromptBuilder(["Valid"], num_ctx=130, reserve_tokens=0).build(review)
+    kept = _review_part(messages)
+    assert info["review_truncated"] and info["prompt_tokens"] <= 130
+    assert kept.endswith(" ...") and "they've ever" in kept
+    assert review.startswith(kept[:-len(" ...")])
+
+
+def test_review_that_fits_is_untouched():
+    messages, info = PromptBuilder(["Valid"]).build("Lovely staff, don't miss the tiramisu!")
+    assert not info["review_truncated"]
+    assert _review_part(messages) == "Lovely staff, don't miss the tiramisu!"
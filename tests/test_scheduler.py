@@ -0,0 +1,26 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import queue
+import threading
+
+import pytest
+
+from src_RAG.scheduler import InferenceScheduler
+
+
+def test_cancelled_calls_give_back_their_queue_place():
+    scheduler = InferenceScheduler(concurrency=1, max_queue=1)
+    release = threading.Event()
+    running = scheduler.submit("m", release.wait)
+    queued = scheduler.submit("m", lambda: "queued")
+    with pytest.raises(queue.Full):
+        scheduler.submit("m", lambda: "full", timeout=0)
+
+    assert queued.cancel()
+    assert scheduler.stats()["m"]["queued_interactive"] == 0
+    third = scheduler.submit("m", lambda: "third", timeout=0)
+    release.set()
+    assert running.result(timeout=5) is True
+    assert third.result(timeout=5) == "third"
@@ -0,0 +1,27 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from src_RAG.serving import parse_deadline
+
+
+def test_parse_deadline():
+    assert parse_deadline(None) is None
+    assert parse_deadline(2) == 2.0
+    assert parse_deadline("0.5") == 0.5
+
+
+@pytest.mark.parametrize("value", ["abc", "", 0, -1, "nan", "inf", True, [1]])
+def test_parse_deadline_rejects(value):
+    with pytest.raises(ValueError):
+        parse_deadline(value)
+
+
+def test_parse_deadline_may_shorten_but_not_extend_request_deadline():
+    assert parse_deadline(1.5, max_deadline=2.0) == 1.5
+    assert parse_deadline(2, max_deadline=2.0) == 2.0
+    with pytest.raises(ValueError):
+        parse_deadline(5, max_deadline=2.0)
+    assert parse_deadline(5, max_deadline=None) == 5.0
@@ -0,0 +1,162 @@
+import asyncio
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from src_RAG.cache import ClassificationCache
+from src_RAG.hedging import ModelCall, TailLatencyConfig
+from src_RAG.scheduler import InferenceScheduler
+from src_Benchmark.mock_ollama import MockOllama, AsyncMockOllama, MockOllamaError
+from conftest import MODELS, fixed_latency
+
+SLOW = "deepseek-r1:7b"
+REVIEW = "Lovely pasta and friendly staff, we will be back"
+
+
+class StallFirstCall:
+    """MockOllama mixin: the first call to `stall_model` takes `stall` seconds."""
+
+    def __init__(self, stall_model, stall, **kwargs):
+        super().__init__(**kwargs)
+        self.stall_model = stall_model
+        self.stall = stall
+        self.stalled = False
+
+    def _sample_latency(self, model):
+        delay, fails = super()._sample_latency(model)
+        with self._lock:
+            first = model == self.stall_model and not self.stalled
+            self.stalled = self.stalled or first
+        return (self.stall if first else delay), fails
+
+
+class StallingMock(StallFirstCall, MockOllama):
+    pass
+
+
+class AsyncStallingMock(StallFirstCall, AsyncMockOllama):
+    pass
+
+
+def _done(result=None, error=None):
+    future = Future()
+    future.set_exception(error) if error is not None else future.set_result(result)
+    return future
+
+
+# --- ModelCall ---------------------------------------------------------------
+
+def test_model_call_waits_then_takes_the_first_answer():
+    call = ModelCall("m", deadline_at=time.monotonic() + 60)
+    running, hedge = Future(), _done({"model": "m", "label": "Valid"})
+    call.attempts = [running]
+    assert not call.settle(time.monotonic())
+    call.attempts.append(hedge)
+    assert call.settle(time.monotonic())
+    assert (call.outcome, call.hedge_won, call.output["label"]) == ("ok", True, "Valid")
+    assert running.cancelled()
+
+
+def test_model_call_fails_only_once_every_attempt_failed():
+    call = ModelCall("m")
+    call.attempts = [_done(error=RuntimeError("boom")), Future()]
+    assert not call.settle(time.monotonic())
+    call.attempts[1] = _done(error=RuntimeError("again"))
+    assert call.settle(time.monotonic())
+    assert call.outcome == "error" and call.output["label"] is None and call.output["error"] == "boom"
+    assert str(call.first_error()) == "boom"
+
+
+def test_model_call_times_out_at_its_deadline():
+    call = ModelCall("m", deadline_at=time.monotonic() - 0.01)
+    running = Future()
+    call.attempts = [running]
+    assert call.settle(time.monotonic())
+    assert call.outcome == "timeout" and call.output["timed_out"] and call.output["label"] is None
+    assert running.cancelled()
+
+
+def test_model_call_hedges_once_after_its_threshold():
+    call = ModelCall("m", hedge_after=0.5)
+    call.attempts = [Future()]
+    assert not call.hedge_due(time.monotonic() + 10)  # still queued
+    call.started = time.monotonic()
+    assert call.wake_at(call.started) == pytest.approx(call.started + 0.5)
+    assert not call.hedge_due(call.started + 0.1) and call.hedge_due(call.started + 0.5)
+    call.attempts.append(Future())
+    assert not call.hedge_due(call.started + 10)
+
+
+# --- Classifier --------------------------------------------------------------
+
+def test_deadline_votes_with_the_models_that_answered(make_classifier):
+    mock = MockOllama(latency=fixed_latency(0, {SLOW: 0.5}), agreement=1.0)
+    classifier = make_classifier(mock, tail_latency=TailLatencyConfig(deadline=0.2), cache=ClassificationCache())
+    start = time.perf_counter()
+    result = classifier.classify(REVIEW, return_timings=True)
+    assert time.perf_counter() - start < 0.45
+    outputs = {o["model"]: o for o in result["model_outputs"]}
+    assert outputs[SLOW]["timed_out"] and outputs[SLOW]["label"] is None
+    assert result["resolved_by"] == "quorum" and sum(result["votes"].values()) == 2
+    # A partial quorum is not cached; the next full vote is
+    assert classifier.cache.stats()["memory_size"] == 0
+    classifier.deadline = None
+    assert classifier.classify(REVIEW, return_timings=True)["resolved_by"] == "ensemble"
+    assert classifier.cache.stats()["memory_size"] == 1
+
+
+def test_failed_models_are_reported_and_the_rest_vote(make_classifier):
+    classifier = make_classifier(MockOllama(latency=fixed_latency(), failure_rate={SLOW: 1.0}, agreement=1.0))
+    result = classifier.classify(REVIEW, return_timings=True)
+    outputs = {o["model"]: o for o in result["model_outputs"]}
+    assert "injected failure" in outputs[SLOW]["error"]
+    assert result["resolved_by"] == "quorum" and result["label"] != "unknown"
+
+
+def test_every_model_failing_raises(make_classifier):
+    classifier = make_classifier(MockOllama(latency=fixed_latency(), failure_rate=1.0))
+    with pytest.raises(MockOllamaError):
+        classifier.classify(REVIEW)
+
+
+def test_hedge_wins_over_a_stalled_call(make_classifier):
+    mock = StallingMock(SLOW, 3.0, latency=fixed_latency(0.01), agreement=1.0, concurrency=2)
+    classifier = make_classifier(mock, tail_latency=TailLatencyConfig(hedge_percentile=50, hedge_min_samples=1))
+    for model in MODELS:
+        classifier.latency.record(model, 0.05)
+    start = time.perf_counter()
+    result = classifier.classify(REVIEW, return_timings=True)
+    assert time.perf_counter() - start < 1.5
+    assert result["resolved_by"] == "ensemble" and mock.calls[SLOW] == 2
+
+
+def test_cascade_reports_models_it_had_no_time_for(make_classifier):
+    costs = {"gemma3:4b": 1, SLOW: 2, "llama2:7b": 3}
+    mock = MockOllama(latency=fixed_latency(0, {SLOW: 0.5}), agreement=1.0)
+    classifier = make_classifier(mock, cascade=True, model_costs=costs, tail_latency=TailLatencyConfig(deadline=0.2))
+    result = classifier.classify(REVIEW, return_timings=True)
+    outputs = {o["model"]: o for o in result["model_outputs"]}
+    assert outputs["gemma3:4b"]["label"] is not None
+    assert outputs[SLOW]["timed_out"]
+    assert outputs["llama2:7b"]["timed_out"] and outputs["llama2:7b"]["rationale"] == "Not reached before the deadline"
+    assert result["resolved_by"] == "quorum"
+
+
+def test_async_timeout_cancels_the_call_and_frees_its_slot(make_classifier):
+    async_mock = AsyncStallingMock(SLOW, 5.0, latency=fixed_latency(), agreement=1.0, concurrency=2)
+    classifier = make_classifier(
+        async_mock=async_mock, tail_latency=TailLatencyConfig(deadline=0.3), scheduler=InferenceScheduler(concurrency=1)
+    )
+
+    async def twice():
+        first = await classifier.aclassify(REVIEW, return_timings=True)
+        second = await classifier.aclassify(REVIEW + "!", return_timings=True)
+        return first, second
+
+    start = time.perf_counter()
+    first, second = asyncio.run(twice())
+    assert time.perf_counter() - start < 2
+    assert first["resolved_by"] == "quorum"
+    # With one async slot per model, the second call only reaches the slow model if the cancelled one let go
+    assert second["resolved_by"] == "ensemble"